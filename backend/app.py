@@ -1,22 +1,47 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import cv2
 import torch
 import numpy as np
 import base64
+import copy
+import json
 from io import BytesIO
 from PIL import Image
+import os
+import sys
 import threading
 import time
 from collections import defaultdict
-from scipy.spatial import distance
+
+from live_state import VersionedValue
+from profiler import SamplingProfiler, FrameProfiler, ProfilerBusy
+from tracker import VehicleTracker, TYPE_MAPPING, VEHICLE_CATEGORIES
+from detections import Detections, build_category_lut
+from detection_log import DetectionLogWriter
+from video_index import TimelineJob
+from capture import FrameSource
+from zones import ZoneSet
+from forecast import SeasonalForecaster, VOLUME, VEHICLE_COUNT, AVERAGE_SPEED
+from synthetic import SyntheticCapture, FakeDetector
+from inference import InferenceEngine
+from checkpoint import Checkpointer, read_checkpoint
+from reid import ReIdIndex, appearance_embedding
+from metrics import REGISTRY, Counter, Gauge, Histogram, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+CORS(app, expose_headers=['ETag', 'X-State-Version'])  # Enable CORS for React frontend
 
 # Global variables for detection
 model = None
+inference_engine = None  # InferenceEngine wrapping model (per-stream profiles + auto-tuning)
+category_lut = None  # Model class id -> vehicle category index, built on first frame
+TARGET_FPS = 15.0  # Auto-tuner target for live streams
 detection_thread = None
+DETECTION_JOIN_TIMEOUT_S = 10.0  # How long stop/start wait for the previous loop to exit
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+timeline_job = None  # TimelineJob (frame/keyframe index + thumbnails) for file sources
+minute_counts = defaultdict(int)  # {video minute: vehicles counted} for the timeline scrubber
 is_detecting = False
 is_paused = False  # If true, detection loop will pause processing frames
 current_stats = {
@@ -26,7 +51,8 @@ current_stats = {
     'bikes': 0,
     'total': 0,
     'confidence': 0.0,
-    'recent_detections': [],
+    'recent_detections': Detections.empty(),  # Converted to dicts in serialize_stats
+    'detected_at': None,  # Wall-clock time of recent_detections
     'vehicle_count': 0,  # Total vehicles that crossed the line
     'counts_by_type': {
         'cars': 0,
@@ -52,8 +78,12 @@ class TrafficData:
         self.vehicle_count = 0
         self.average_speed = 0.0
         self.traffic_density = 'LOW'  # LOW, MEDIUM, HIGH
-        self.queue_length = 0
+        self.queue_length = 0  # Vehicles
+        self.queue_length_m = None  # Longest zone queue in meters (None when no zones are configured)
         self.congestion_level = 'NORMAL'  # NORMAL, MODERATE, SEVERE
+        self.occupancy = None  # Max zone occupancy % (None when no zones are configured)
+        self.queued_vehicles = 0
+        self.zones = []  # Per-zone measurements from ZoneSet.measure
         self.last_updated = None
 
     def to_dict(self):
@@ -65,21 +95,42 @@ class TrafficData:
             'average_speed': self.average_speed,
             'traffic_density': self.traffic_density,
             'queue_length': self.queue_length,
+            'queue_length_m': self.queue_length_m,
             'congestion_level': self.congestion_level,
+            'occupancy': self.occupancy,
+            'queued_vehicles': self.queued_vehicles,
+            'zones': self.zones,
             'last_updated': self.last_updated
         }
 
-    def update_from_stats(self, stats):
-        """Update traffic data from current detection stats"""
+    def update_from_stats(self, stats, zone_metrics=None):
+        """Update traffic data from current detection stats
+
+        zone_metrics: per-zone measurements from ZoneSet.measure; when present,
+        queue length (queued vehicles, plus the longest queue in meters) and
+        occupancy come from the zones.
+        """
         from datetime import datetime, timezone
 
         self.timestamp = datetime.now(timezone.utc).isoformat()
         self.vehicle_count = stats.get('total', 0)
         self.average_speed = stats.get('speed_stats', {}).get('average_speed', 0.0)
         self.traffic_density = self.classify_density(self.vehicle_count)
-        self.congestion_level = self.classify_congestion(self.vehicle_count, self.average_speed)
-        # Estimate queue length based on vehicle count (simplified)
-        self.queue_length = max(0, self.vehicle_count - 10)
+        if zone_metrics:
+            self.zones = zone_metrics
+            self.occupancy = max(z['occupancy'] for z in zone_metrics)
+            self.queued_vehicles = sum(z['queued_vehicles'] for z in zone_metrics)
+            self.queue_length = self.queued_vehicles
+            # Longest lane queue in meters
+            self.queue_length_m = max(z['queue_length_m'] for z in zone_metrics)
+        else:
+            self.zones = []
+            self.occupancy = None
+            self.queued_vehicles = 0
+            self.queue_length_m = None
+            # Estimate queue length based on vehicle count (simplified)
+            self.queue_length = max(0, self.vehicle_count - 10)
+        self.congestion_level = self.classify_congestion(self.vehicle_count, self.average_speed, self.occupancy)
         self.last_updated = datetime.now(timezone.utc).isoformat()
 
     @staticmethod
@@ -93,11 +144,11 @@ class TrafficData:
             return 'HIGH'
 
     @staticmethod
-    def classify_congestion(vehicle_count, average_speed):
-        """Classify congestion level based on vehicle count and speed"""
-        if vehicle_count > 40 or average_speed < 5:
+    def classify_congestion(vehicle_count, average_speed, occupancy=None):
+        """Classify congestion level based on vehicle count, speed and zone occupancy %"""
+        if vehicle_count > 40 or average_speed < 5 or (occupancy is not None and occupancy >= 60):
             return 'SEVERE'
-        elif vehicle_count > 25 or average_speed < 15:
+        elif vehicle_count > 25 or average_speed < 15 or (occupancy is not None and occupancy >= 35):
             return 'MODERATE'
         else:
             return 'NORMAL'
@@ -105,6 +156,8 @@ class TrafficData:
 # Initialize traffic data instance
 traffic_data = TrafficData()
 
+CONGESTION_SEVERITY = {'NORMAL': 0, 'MODERATE': 1, 'SEVERE': 2}
+
 class SignalController:
     """Adaptive traffic signal controller based on congestion levels"""
     def __init__(self):
@@ -120,6 +173,13 @@ class SignalController:
         }
         self.yellow_time = 5
         self.red_time = 10  # Fixed red time between cycles
+        self.queue_extension = 0  # Extra green seconds to discharge the measured queue
+        self.max_queue_extension = 20
+        self.vehicle_spacing_m = 7.5  # Queued vehicle length plus gap
+        self.discharge_headway_s = 2.0  # Saturation headway per queued vehicle
+        self.forecast_enabled = False  # Use predicted congestion when it is worse than current
+        self.forecast_horizon_minutes = 10
+        self.forecast_congestion = None  # Predicted level at forecast_horizon_minutes
 
     def update_congestion(self, congestion_level):
         """Update signal timing based on congestion level"""
@@ -136,9 +196,25 @@ class SignalController:
                 self.alerts = self.alerts[-5:]
             self.last_congestion = congestion_level
 
+    def update_queue(self, queue_length_m):
+        """Extend green time to discharge the measured queue (from measurement zones)"""
+        vehicles = queue_length_m / self.vehicle_spacing_m
+        self.queue_extension = int(min(self.max_queue_extension, round(vehicles * self.discharge_headway_s)))
+
+    def update_forecast(self, predicted_congestion):
+        """Record the forecast congestion level for the configured horizon"""
+        self.forecast_congestion = predicted_congestion
+
+    def get_timing_congestion(self):
+        """Congestion level that drives green time (current, or forecast if worse and enabled)"""
+        if self.forecast_enabled and self.forecast_congestion is not None and \
+           CONGESTION_SEVERITY[self.forecast_congestion] > CONGESTION_SEVERITY[self.last_congestion]:
+            return self.forecast_congestion
+        return self.last_congestion
+
     def get_current_timing(self):
-        """Get current green time based on congestion"""
-        return self.green_timings.get(self.last_congestion, 30)
+        """Get current green time based on congestion and queue length"""
+        return self.green_timings.get(self.get_timing_congestion(), 30) + self.queue_extension
 
     def advance_phase(self):
         """Advance to next phase in cycle"""
@@ -161,15 +237,25 @@ class SignalController:
                 self.remaining_time = self.red_time
                 self.phase_start_time = current_time
 
+    def get_phase_duration(self):
+        """Get the total duration of the current phase"""
+        if self.phase == 'GREEN':
+            return self.get_current_timing()
+        if self.phase == 'YELLOW':
+            return self.yellow_time
+        return self.red_time
+
     def get_status(self):
         """Get current signal status"""
-        current_time = time.time()
-        elapsed = current_time - self.phase_start_time
-        self.remaining_time = max(0, self.remaining_time - elapsed)
+        elapsed = time.time() - self.phase_start_time
+        # Derive from the phase start rather than decrementing in place, so
+        # repeated calls don't drain the countdown
+        self.remaining_time = max(0, self.get_phase_duration() - elapsed)
         return {
             'phase': self.phase,
             'remaining_time': int(self.remaining_time),
             'congestion_level': self.last_congestion,
+            'forecast_congestion': self.forecast_congestion if self.forecast_enabled else None,
             'green_time': self.get_current_timing()
         }
 
@@ -177,372 +263,404 @@ class SignalController:
         """Get recent signal decisions/alerts"""
         return self.alerts.copy()
 
+    STATE_FIELDS = ('phase', 'last_congestion', 'alerts', 'phase_start_time', 'queue_extension',
+                    'forecast_enabled', 'forecast_horizon_minutes', 'forecast_congestion')
+
+    def to_state(self):
+        """JSON-able snapshot of the controller for checkpointing"""
+        state = {name: getattr(self, name) for name in self.STATE_FIELDS}
+        state['alerts'] = [dict(alert) for alert in self.alerts]
+        return state
+
+    def load_state(self, state):
+        """Restore from to_state(); the phase clock keeps running across the restart"""
+        for name in self.STATE_FIELDS:
+            if name in state:
+                setattr(self, name, state[name])
+
 # Initialize signal controller
 signal_controller = SignalController()
-video_cap = None
+frame_source = None  # FrameSource: owns the VideoCapture on its decode thread
 stats_lock = threading.Lock()
-current_frame_with_detections = None  # Store the latest frame with detections drawn
-frame_lock = threading.Lock()  # Lock for frame access
-seek_lock = threading.Lock()  # Lock to make seek operations atomic
+
+# Versioned snapshots of live state served by the read endpoints.
+# Each publish bumps the version; bodies are serialized once per version.
+stats_state = VersionedValue('stats', copy.deepcopy(current_stats))
+frame_state = VersionedValue('frame')  # {'frame': ndarray, 'position', 'frames', 'fps'} or None
+traffic_state = VersionedValue('traffic', traffic_data.to_dict())
+signal_status_state = VersionedValue('signal-status', signal_controller.get_status())
+signal_decisions_state = VersionedValue('signal-decisions', signal_controller.get_decisions())
+MAX_LONG_POLL_MS = 30000  # Upper bound for ?wait= on long-poll requests
+
+# Short-term forecasting (one row per intersection; this process feeds its own stream)
+forecaster = SeasonalForecaster(bin_seconds=60)
+FORECAST_HORIZONS_MINUTES = (5, 10, 15)
+forecast_state = VersionedValue('forecast')
+
+
+def build_forecast():
+    """Forecast every intersection in one vectorized call"""
+    bins_per_minute = 60.0 / forecaster.bin_seconds
+    horizons = [max(1, int(round(m * bins_per_minute))) for m in FORECAST_HORIZONS_MINUTES]
+    values, ready = forecaster.forecast(horizons)
+    intersections = []
+    for row, intersection_id in enumerate(forecaster.ids):
+        points = []
+        for j, minutes in enumerate(FORECAST_HORIZONS_MINUTES):
+            volume, vehicle_count, average_speed = values[row, j]
+            points.append({
+                'minutes': minutes,
+                'volume_per_minute': round(float(volume) * bins_per_minute, 2),
+                'vehicle_count': round(float(vehicle_count), 1),
+                'average_speed': round(float(average_speed), 2),
+                'congestion_level': TrafficData.classify_congestion(vehicle_count, average_speed)
+            })
+        intersections.append({'intersection_id': intersection_id, 'ready': bool(ready[row]), 'horizons': points})
+    return {'bin_seconds': forecaster.bin_seconds, 'intersections': intersections}
+
+
+def update_forecast():
+    """Close finished forecast bins and refresh the published forecast and controller input"""
+    if not forecaster.roll(time.time()):
+        return
+    forecast = build_forecast()
+    forecast_state.publish(forecast)
+    for entry in forecast['intersections']:
+        if entry['intersection_id'] != STREAM_ID or not entry['ready']:
+            continue
+        horizon = min(entry['horizons'],
+                      key=lambda p: abs(p['minutes'] - signal_controller.forecast_horizon_minutes))
+        signal_controller.update_forecast(horizon['congestion_level'])
+
+
+# Instrumentation exported at /metrics (Prometheus text format)
+STREAM_ID = traffic_data.intersection_id  # Label for the single live camera stream
+STAGE_LATENCY = Histogram('traffic_stage_latency_seconds', 'Latency of each detection pipeline stage',
+                          ['stream', 'stage'])
+FRAMES_PROCESSED = Counter('traffic_frames_processed_total', 'Frames run through the detection pipeline',
+                           ['stream'])
+FRAMES_DROPPED = Counter('traffic_frames_dropped_total', 'Frames the capture failed to deliver', ['stream'])
+PIPELINE_ERRORS = Counter('traffic_pipeline_errors_total', 'Errors raised in the detection pipeline',
+                          ['stream', 'stage'])
+VEHICLES_COUNTED = Counter('traffic_vehicles_counted_total', 'Vehicles that crossed the counting line',
+                           ['stream', 'type'])
+EFFECTIVE_FPS = Gauge('traffic_effective_fps', 'Smoothed processed frames per second', ['stream'])
+ACTIVE_TRACKS = Gauge('traffic_active_tracks', 'Vehicle tracks currently held by the tracker', ['stream'])
+DETECTING = Gauge('traffic_detecting', 'Whether the detection loop is running (1) or not (0)', ['stream'])
+INFERENCE_INPUT_SIZE = Gauge('traffic_inference_input_size', 'Model input size chosen for each stream',
+                             ['stream'])
+REID_MATCHES = Counter('traffic_reid_matches_total', 'Vehicles re-identified between two cameras',
+                       ['from_stream', 'to_stream'])
+CAPTURE_QUEUE_DEPTH = Gauge('traffic_capture_queue_depth', 'Decoded frames waiting for the detection loop',
+                            ['stream'])
+LONG_POLL_WAITERS = Gauge('traffic_long_poll_waiters', 'Clients blocked in a long-poll per state', ['state'])
+
+
+def collect_sampled_metrics():
+    """Refresh gauges that are sampled at scrape time rather than per frame"""
+    DETECTING.set(int(is_detecting and not is_paused), stream=STREAM_ID)
+    ACTIVE_TRACKS.set(len(tracked_vehicles), stream=STREAM_ID)
+    source = frame_source
+    CAPTURE_QUEUE_DEPTH.set(source.queue_depth if source is not None else 0, stream=STREAM_ID)
+    if inference_engine is not None:
+        for stream in list(inference_engine.tuners):
+            INFERENCE_INPUT_SIZE.set(inference_engine.profile_for(stream).size, stream=stream)
+    for state in (stats_state, frame_state, traffic_state, signal_status_state, signal_decisions_state):
+        LONG_POLL_WAITERS.set(state.waiters, state=state.name)
+
+
+REGISTRY.add_collector(collect_sampled_metrics)
+forecast_row = forecaster.index_of(STREAM_ID)
+
+# On-demand profilers for the running process (see /api/admin/profile/*)
+sampling_profiler = SamplingProfiler()
+frame_profiler = FrameProfiler()
+MAX_PROFILE_SECONDS = 60
+
+
+def stats_key(stats):
+    """Stats content without the detection wall-clock time, for change detection"""
+    return {key: value for key, value in stats.items() if key != 'detected_at'}
+
+
+def traffic_key(data):
+    """Traffic data without its update timestamps, for change detection"""
+    return {key: value for key, value in data.items() if key not in ('timestamp', 'last_updated')}
+
+
+def publish_stats():
+    """Publish a snapshot of current_stats if its content changed (caller must hold stats_lock)"""
+    stats_state.publish_if_changed(copy.deepcopy(current_stats), key=stats_key)
+
+
+def publish_signal_state():
+    """Republish signal status and decisions if they changed (the countdown ticks every second)"""
+    signal_status_state.publish_if_changed(signal_controller.get_status())
+    signal_decisions_state.publish_if_changed(signal_controller.get_decisions())
+
+
+def versioned_response(state, serialize=None):
+    """Serve a VersionedValue honoring If-None-Match and ?since=&wait= long-polls"""
+    since = request.args.get('since', type=int)
+    wait_ms = request.args.get('wait', default=0, type=int)
+    # A since newer than the current version was issued before a restart; answer right away
+    if since is not None and wait_ms > 0 and since <= state.version:
+        state.wait_for(since, min(wait_ms, MAX_LONG_POLL_MS) / 1000.0)
+
+    version = state.version
+    if request.if_none_match.contains(state.etag(version)):
+        response = Response(status=304)
+    else:
+        version, body = state.body(serialize)
+        response = Response(body, mimetype='application/json')
+    response.set_etag(state.etag(version))
+    response.headers['X-State-Version'] = str(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 # Vehicle tracking and counting
-counting_line = [(100, 300), (500, 300)]  # Default counting line [start, end]
-tracked_vehicles = {}  # {track_id: {'last_position': (x, y), 'counted': False, 'type': str, 'last_seen': time, 'speed': float, 'position_history': [(x, y, time)], 'speed_history': [speed]}}
-next_track_id = 0
-max_disappeared = 30  # Frames before removing a track
-max_distance = 100  # Max distance for centroid matching
+vehicle_tracker = VehicleTracker(
+    counting_line=[(100, 300), (500, 300)],  # Default counting line [start, end]
+    max_disappeared=30,  # Frames before removing a track
+    max_distance=100,  # Max distance for centroid matching
+    pixel_to_meter_ratio=0.05  # Default: 1 pixel = 0.05 meters (can be calibrated)
+)
+tracked_vehicles = vehicle_tracker.tracks  # Live view of the tracker's tracks
+
+# Polygon measurement zones per approach lane (None until configured via /api/zones)
+zone_set = None
 
 # Auto-calibration disabled (removed)
 
 
 # Speed estimation parameters
-pixel_to_meter_ratio = 0.05  # Default: 1 pixel = 0.05 meters (can be calibrated)
 fps = 30  # Frames per second
 speed_limit_kmh = 60  # Default speed limit in km/h
 
-def get_centroid(bbox):
-    """Calculate centroid of bounding box"""
-    x1, y1, x2, y2 = bbox
-    return ((x1 + x2) // 2, (y1 + y2) // 2)
+def update_tracker(detections, frame_shape, timestamp_s=None):
+    """Update vehicle tracker and check for line crossings
 
-def calculate_speed_pixels_per_second(prev_pos, curr_pos, time_elapsed):
-    """Calculate speed in pixels per second"""
-    if time_elapsed <= 0:
-        return 0.0
-    
-    pixel_distance = np.sqrt((curr_pos[0] - prev_pos[0])**2 + (curr_pos[1] - prev_pos[1])**2)
-    return pixel_distance / time_elapsed
+    timestamp_s: seconds in video timebase (preferred). If None, wall-clock will be used.
+    Returns the crossing events produced by this frame.
+    """
+    crossings = vehicle_tracker.update(detections, timestamp_s)
+    if crossings:
+        forecaster.observe(forecast_row, VOLUME, len(crossings), count=0)
+    for crossing in crossings:
+        vehicle_type = crossing['type']
+        plural_type = TYPE_MAPPING.get(vehicle_type, 'cars')
+        with stats_lock:
+            current_stats['vehicle_count'] += 1
+            current_stats['counts_by_type'][plural_type] = \
+                current_stats['counts_by_type'].get(plural_type, 0) + 1
+        VEHICLES_COUNTED.inc(stream=STREAM_ID, type=plural_type)
+        if timeline_job is not None:
+            minute_counts[int(crossing['timestamp'] // 60)] += 1
+        print(f"Vehicle {crossing['track_id']} ({vehicle_type}) crossed the line. Total count: {current_stats['vehicle_count']}")
+    return crossings
 
-def pixels_to_meters_per_second(pixels_per_second):
-    """Convert pixels per second to meters per second"""
-    return pixels_per_second * pixel_to_meter_ratio
 
-def meters_per_second_to_kmh(mps):
-    """Convert meters per second to km/h"""
-    return mps * 3.6
+# Cross-camera re-identification: sightings from every stream share one index
+reid_index = ReIdIndex()
 
-def calculate_vehicle_speed(track_id, current_position, current_time):
-    """Calculate vehicle speed from tracking history"""
-    global tracked_vehicles
-    
-    if track_id not in tracked_vehicles:
-        return 0.0
-    
-    track = tracked_vehicles[track_id]
-    
-    # Initialize position history if not exists
-    if 'position_history' not in track:
-        track['position_history'] = []
-    
-    # Add current position to history
-    track['position_history'].append((current_position[0], current_position[1], current_time))
-    
-    # Keep only last 10 positions (for smoothing)
-    if len(track['position_history']) > 10:
-        track['position_history'] = track['position_history'][-10:]
-    
-    # Need at least 2 positions to calculate speed
-    if len(track['position_history']) < 2:
-        return 0.0
-    
-    # Calculate speed using last 2-3 positions for better accuracy
-    positions = track['position_history']
-    
-    # Use last 2 positions for immediate speed
-    prev_pos = positions[-2]
-    curr_pos = positions[-1]
-    
-    time_elapsed = curr_pos[2] - prev_pos[2]
-    
-    if time_elapsed <= 0:
-        return 0.0
-    
-    # Calculate pixel distance
-    pixel_speed = calculate_speed_pixels_per_second(
-        (prev_pos[0], prev_pos[1]),
-        (curr_pos[0], curr_pos[1]),
-        time_elapsed
-    )
-    
-    # Convert to real-world speed
-    mps = pixels_to_meters_per_second(pixel_speed)
-    kmh = meters_per_second_to_kmh(mps)
-    
-    # Store speed history for smoothing
-    if 'speed_history' not in track:
-        track['speed_history'] = []
-    
-    track['speed_history'].append(kmh)
-    if len(track['speed_history']) > 5:
-        track['speed_history'] = track['speed_history'][-5:]
-    
-    # Return average speed (smoothed)
-    if len(track['speed_history']) > 1:
-        avg_speed = np.mean(track['speed_history'])
-        track['speed'] = avg_speed
-        return avg_speed
-    
-    track['speed'] = kmh
-    return kmh
-
-def orientation(p, q, r):
-    """Find orientation of ordered triplet (p, q, r)"""
-    val = (q[1] - p[1]) * (r[0] - q[0]) - (q[0] - p[0]) * (r[1] - q[1])
-    if val == 0:
-        return 0  # Collinear
-    return 1 if val > 0 else 2  # Clockwise or Counterclockwise
-
-def is_crossing_line(point, line_start, line_end, prev_point=None):
-    """Check if a point crosses a line"""
-    if prev_point is None:
-        return False
-    
-    o1 = orientation(line_start, line_end, prev_point)
-    o2 = orientation(line_start, line_end, point)
-    o3 = orientation(prev_point, point, line_start)
-    o4 = orientation(prev_point, point, line_end)
-    
-    # General case: line segments intersect
-    if o1 != o2 and o3 != o4:
-        return True
-    
-    return False
 
-def update_tracker(detections, frame_shape, timestamp_s=None):
-    """Update vehicle tracker and check for line crossings
+def add_reid_sighting(stream, track_id, vehicle_type, embedding, timestamp=None):
+    """Index one sighting and count the travel-time match it produced, if any"""
+    match = reid_index.add(stream, track_id, vehicle_type, embedding, timestamp)
+    if match is not None:
+        REID_MATCHES.inc(from_stream=match['from_stream'], to_stream=match['to_stream'])
+    return match
 
-    timestamp_s: seconds in video timebase (preferred). If None, wall-clock will be used.
-    """
-    global tracked_vehicles, next_track_id, current_stats
-    
-    if not detections:
-        # Increment disappeared count for all tracks
-        for track_id in list(tracked_vehicles.keys()):
-            tracked_vehicles[track_id]['disappeared'] = tracked_vehicles[track_id].get('disappeared', 0) + 1
-            if tracked_vehicles[track_id]['disappeared'] > max_disappeared:
-                del tracked_vehicles[track_id]
-        return tracked_vehicles
-    
-    # Get current centroids from detections
-    current_centroids = []
-    detection_info = []
-    for det in detections:
-        bbox = det['bbox']
-        centroid = get_centroid(bbox)
-        current_centroids.append(centroid)
-        detection_info.append({
-            'centroid': centroid,
-            'type': det['type'],
-            'bbox': bbox
-        })
-    
-    # If no timestamp provided, fall back to wall-clock
-    if timestamp_s is None:
-        timestamp_s = time.time()
-
-    # If no existing tracks, create new ones
-    if len(tracked_vehicles) == 0:
-        current_time = timestamp_s
-        for i, det_info in enumerate(detection_info):
-            tracked_vehicles[next_track_id] = {
-                'last_position': det_info['centroid'],
-                'counted': False,
-                'type': det_info['type'],
-                'disappeared': 0,
-                'last_seen': current_time,
-                'speed': 0.0,
-                'position_history': [(det_info['centroid'][0], det_info['centroid'][1], current_time)],
-                'speed_history': []
-            }
-            next_track_id += 1
-    else:
-        # Match existing tracks with new detections
-        track_ids = list(tracked_vehicles.keys())
-        track_centroids = [tracked_vehicles[tid]['last_position'] for tid in track_ids]
-        
-        # Calculate distance matrix
-        if len(track_centroids) > 0 and len(current_centroids) > 0:
-            D = distance.cdist(np.array(track_centroids), np.array(current_centroids))
-            
-            # Find minimum values
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
-            
-            used_track_ids = set()
-            used_detection_indices = set()
-            
-            # Update existing tracks
-            for (row, col) in zip(rows, cols):
-                if row in used_track_ids or col in used_detection_indices:
-                    continue
-                
-                if D[row, col] > max_distance:
-                    continue
-                
-                track_id = track_ids[row]
-                det_info = detection_info[col]
-                prev_position = tracked_vehicles[track_id]['last_position']
-                current_position = det_info['centroid']
-                
-                # Check for line crossing
-                if not tracked_vehicles[track_id]['counted'] and \
-                   is_crossing_line(current_position, counting_line[0], counting_line[1], prev_position):
-                    tracked_vehicles[track_id]['counted'] = True
-                    vehicle_type = det_info['type']
-                    # Map singular vehicle type to plural key for consistency
-                    type_mapping = {'car': 'cars', 'truck': 'trucks', 'bus': 'buses', 'bike': 'bikes'}
-                    plural_type = type_mapping.get(vehicle_type, 'cars')
-                    with stats_lock:
-                        current_stats['vehicle_count'] += 1
-                        current_stats['counts_by_type'][plural_type] = \
-                            current_stats['counts_by_type'].get(plural_type, 0) + 1
-                    print(f"Vehicle {track_id} ({vehicle_type}) crossed the line. Total count: {current_stats['vehicle_count']}")
-                
-                # Calculate speed using provided timestamp (video timebase)
-                current_time = timestamp_s if timestamp_s is not None else time.time()
-                speed_kmh = calculate_vehicle_speed(track_id, current_position, current_time)
-                
-                # Update track
-                tracked_vehicles[track_id]['last_position'] = current_position
-                tracked_vehicles[track_id]['type'] = det_info['type']
-                tracked_vehicles[track_id]['disappeared'] = 0
-                tracked_vehicles[track_id]['last_seen'] = current_time
-                tracked_vehicles[track_id]['speed'] = speed_kmh
-                
-                used_track_ids.add(row)
-                used_detection_indices.add(col)
-            
-            # Handle unmatched tracks (increment disappeared)
-            for row in range(len(track_ids)):
-                if row not in used_track_ids:
-                    track_id = track_ids[row]
-                    tracked_vehicles[track_id]['disappeared'] += 1
-                    if tracked_vehicles[track_id]['disappeared'] > max_disappeared:
-                        del tracked_vehicles[track_id]
-            
-            # Create new tracks for unmatched detections
-            for col in range(len(current_centroids)):
-                if col not in used_detection_indices:
-                    det_info = detection_info[col]
-                    current_time = time.time()
-                    tracked_vehicles[next_track_id] = {
-                        'last_position': det_info['centroid'],
-                        'counted': False,
-                        'type': det_info['type'],
-                        'disappeared': 0,
-                        'last_seen': current_time,
-                        'speed': 0.0,
-                        'position_history': [(det_info['centroid'][0], det_info['centroid'][1], current_time)],
-                        'speed_history': []
-                    }
-                    next_track_id += 1
-    
-    return tracked_vehicles
+
+def add_reid_sightings(frame, crossings, stream=STREAM_ID):
+    """Embed each counted vehicle at its line crossing (wall-clock time, comparable across cameras)"""
+    now = time.time()
+    for crossing in crossings:
+        embedding = appearance_embedding(frame, crossing['bbox'])
+        if embedding is not None:
+            add_reid_sighting(stream, crossing['track_id'], crossing['type'], embedding, now)
+
+
+# Periodic state checkpoints (see checkpoint.py); restored on startup
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checkpoints', 'state.ckpt')
+CHECKPOINT_VERSION = 1
+MAX_TRACK_AGE_S = 30  # Tracks older than this at restore time are dropped (vehicles have moved on)
+checkpointer = None
+
+
+def capture_checkpoint():
+    """(header, arrays) snapshot of all live per-stream state; copies everything it reads"""
+    forecast_scalars, forecast_arrays = forecaster.get_state()
+    with stats_lock:
+        header = {
+            'version': CHECKPOINT_VERSION,
+            'stream': STREAM_ID,
+            'saved_at': time.time(),
+            'stats': {
+                'vehicle_count': current_stats['vehicle_count'],
+                'counts_by_type': dict(current_stats['counts_by_type'])
+            },
+            'tracker': {
+                'next_track_id': vehicle_tracker.next_track_id,
+                'counting_line': [list(p) for p in vehicle_tracker.counting_line],
+                'pixel_to_meter_ratio': vehicle_tracker.pixel_to_meter_ratio
+            },
+            'speed_limit_kmh': speed_limit_kmh,
+            'zones': zone_set.to_config() if zone_set is not None else [],
+            'signal': signal_controller.to_state(),
+            'forecast': forecast_scalars
+        }
+        arrays = {'tracks': vehicle_tracker.to_array()}
+    arrays.update({f'forecast.{name}': array for name, array in forecast_arrays.items()})
+    return header, arrays
+
+
+def restore_checkpoint(path=CHECKPOINT_PATH):
+    """Warm restart from the latest checkpoint; returns True if state was restored"""
+    global zone_set, speed_limit_kmh
+    started = time.perf_counter()
+    try:
+        header, arrays = read_checkpoint(path)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return False
+    if header.get('version') != CHECKPOINT_VERSION or header.get('stream') != STREAM_ID:
+        print(f"Ignoring checkpoint {path}: written for a different version or stream")
+        return False
+
+    age_s = time.time() - header['saved_at']
+    with stats_lock:
+        current_stats['vehicle_count'] = header['stats']['vehicle_count']
+        current_stats['counts_by_type'].update(header['stats']['counts_by_type'])
+        tracker_state = header['tracker']
+        vehicle_tracker.counting_line = [tuple(p) for p in tracker_state['counting_line']]
+        vehicle_tracker.pixel_to_meter_ratio = tracker_state['pixel_to_meter_ratio']
+        tracks = arrays['tracks'] if age_s <= MAX_TRACK_AGE_S else arrays['tracks'][:0]
+        vehicle_tracker.load_array(tracks, tracker_state['next_track_id'])
+        speed_limit_kmh = header['speed_limit_kmh']
+        zone_set = ZoneSet(header['zones']) if header['zones'] else None
+        signal_controller.load_state(header['signal'])
+        publish_stats()
+    forecast_arrays = {name.split('.', 1)[1]: array for name, array in arrays.items()
+                       if name.startswith('forecast.')}
+    forecaster.set_state(header['forecast'], forecast_arrays)
+    publish_signal_state()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Restored checkpoint from {age_s:.1f}s ago in {elapsed_ms:.1f} ms: "
+          f"{current_stats['vehicle_count']} vehicles counted, {len(tracked_vehicles)} tracks")
+    return True
 
 
 # Trajectory-based auto-calibration helper removed.
 # If you want to re-add auto-calibration in the future, implement a separate
 # module/function and wire endpoints explicitly.
 
-def load_model():
-    """Load YOLOv5 model"""
-    global model
+def load_model(fake_inference_ms=None):
+    """Load YOLOv5 model (or the synthetic-scene fake detector when fake_inference_ms is set)"""
+    global model, inference_engine, category_lut
+    category_lut = None
+    if fake_inference_ms is not None:
+        model = FakeDetector(fake_inference_ms)
+        inference_engine = InferenceEngine(model, target_fps=TARGET_FPS)
+        print(f"Fake detector loaded ({fake_inference_ms} ms simulated inference)")
+        return True
     try:
         model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
         model.conf = 0.5  # Confidence threshold (50% - filters out low confidence detections)
         model.iou = 0.45  # IoU threshold for NMS
+        inference_engine = InferenceEngine(model, target_fps=TARGET_FPS)
         print("YOLOv5 model loaded successfully")
         return True
     except Exception as e:
         print(f"Error loading model: {e}")
         return False
 
-def process_frame(frame):
-    """Process a single frame and return detections"""
+def process_frame(frame, stream=STREAM_ID):
+    """Process a single frame and return its vehicle Detections with per-category counts"""
+    global category_lut
     if model is None:
         return None
     
     try:
-        results = model(frame)
-        detections = results.pred[0]  # Get detections for current frame
-        
-        vehicle_counts = defaultdict(int)
-        vehicle_types = {
-            'car': ['car'],
-            'truck': ['truck'],
-            'bus': ['bus'],
-            'bike': ['bicycle', 'motorcycle']
-        }
-        
-        frame_detections = []
-        total_confidence = 0.0
-        detection_count = 0
-        
-        for *xyxy, conf, cls in detections:
-            label = model.names[int(cls)].lower()
-            confidence = float(conf)
-            
-            # Only process detections with confidence >= 0.5 (50%)
-            if confidence < 0.5:
-                continue
-            
-            # Check if it's a vehicle type we're tracking
-            for vehicle_category, labels in vehicle_types.items():
-                if label in labels:
-                    vehicle_counts[vehicle_category] += 1
-                    total_confidence += confidence
-                    detection_count += 1
-                    
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    frame_detections.append({
-                        'type': vehicle_category,
-                        'confidence': round(confidence * 100, 2),
-                        'bbox': [x1, y1, x2, y2]
-                    })
-                    break
+        with STAGE_LATENCY.time(stream=stream, stage='inference'):
+            results = inference_engine(frame, stream)
+        postprocess_start = time.perf_counter()
+        pred = results.pred[0]  # Get detections for current frame
+        if hasattr(pred, 'cpu'):
+            pred = pred.cpu().numpy()
         
-        avg_confidence = (total_confidence / detection_count * 100) if detection_count > 0 else 0.0
+        if category_lut is None:
+            category_lut = build_category_lut(model.names)
+        # model.conf already drops detections below 50% confidence during NMS
+        detections = Detections.from_prediction(pred, category_lut)
+        STAGE_LATENCY.observe(time.perf_counter() - postprocess_start, stream=stream, stage='postprocess')
         
         return {
-            'counts': dict(vehicle_counts),
-            'total': sum(vehicle_counts.values()),
-            'confidence': round(avg_confidence, 2),
-            'detections': frame_detections
+            'counts': detections.counts(),
+            'total': len(detections),
+            'confidence': detections.mean_confidence(),
+            'detections': detections
         }
     except Exception as e:
         print(f"Error processing frame: {e}")
+        PIPELINE_ERRORS.inc(stream=stream, stage='process_frame')
         return None
 
-def detection_loop():
-    """Main detection loop running in background thread"""
-    global is_detecting, video_cap, current_stats, current_frame_with_detections, is_paused, counting_line
+def detection_loop(source, recorder=None):
+    """Main detection loop running in background thread
+
+    source: this session's FrameSource; the loop exits once it is no longer frame_source
+    recorder: optional DetectionLogWriter owned (and closed) by this session
+    """
+    global is_detecting, current_stats, is_paused
 
     # Report the timestamp source once per detection session for debugging
     timestamp_source_reported = False
+    total_frames = source.frame_count
+    last_frame_time = None
+    fps_ewma = 0.0
+    captured = None
+    frames_dropped_seen = 0
+    tuner = inference_engine.register_stream(STREAM_ID)
+    generation = None
     
-    while is_detecting and video_cap is not None:
+    while is_detecting and frame_source is source:
         try:
-            # If a seek is in progress, wait a short amount so seek can safely reposition
-            if seek_lock.locked():
-                time.sleep(0.01)
-                continue
-
             # Respect pause flag: do not read/process frames while paused
             if is_paused:
+                last_frame_time = None  # The pause gap is not a frame interval
                 time.sleep(0.1)
                 continue
 
-            ret, frame = video_cap.read()
-            if not ret:
-                time.sleep(0.1)
+            frame_profiler.frame_start()
+            # Decoded ahead on the source's thread; index and timestamps come cached with the frame
+            with STAGE_LATENCY.time(stream=STREAM_ID, stage='capture_read'):
+                captured = source.read(timeout=0.1)
+            # Live sources replace stale prefetched frames instead of falling behind; decode
+            # failures are lost frames too. Read timeouts and the end of a file are neither.
+            frames_dropped = source.frames_dropped + source.read_failures
+            if frames_dropped > frames_dropped_seen:
+                FRAMES_DROPPED.inc(frames_dropped - frames_dropped_seen, stream=STREAM_ID)
+                frames_dropped_seen = frames_dropped
+            if captured is None:
+                last_frame_time = None
+                if not source.is_alive():
+                    time.sleep(0.1)
                 continue
-        
-            # Compute a reliable timestamp for this frame (video timebase preferred)
-            pos_msec = video_cap.get(cv2.CAP_PROP_POS_MSEC) or 0
-            fps_local_cap = float(video_cap.get(cv2.CAP_PROP_FPS) or 0)
-            frame_idx = int(video_cap.get(cv2.CAP_PROP_POS_FRAMES) or 0)
+            if captured.generation != generation:
+                # First frame of the session or after a seek: don't time the gap before it
+                generation = captured.generation
+                last_frame_time = None
+            frame = captured.image
+            frame_idx = captured.index
+            pos_msec = captured.pos_msec
+            fps_local_cap = captured.fps
 
+            # Compute a reliable timestamp for this frame (video timebase preferred)
             if pos_msec and pos_msec > 0:
                 timestamp_s = float(pos_msec) / 1000.0
                 ts_source = 'pos_msec'
@@ -558,47 +676,70 @@ def detection_loop():
                 print(f"Using timestamp source for speed calc: {ts_source}")
                 timestamp_source_reported = True
 
-            # Create a copy of the frame for drawing
+            # Create a copy of the frame for drawing (the pooled buffer is reused after release)
             frame_copy = frame.copy()
             
             result = process_frame(frame)
+            if result and recorder is not None:
+                recorder.write_frame(frame_idx, timestamp_s, result['detections'])
             if result:
                 # Update tracker and check for line crossings with video timestamp
-                tracked = update_tracker(result['detections'], frame.shape, timestamp_s)
+                with STAGE_LATENCY.time(stream=STREAM_ID, stage='tracker_update'):
+                    crossings = update_tracker(result['detections'], frame.shape, timestamp_s)
+                if crossings:
+                    with STAGE_LATENCY.time(stream=STREAM_ID, stage='reid'):
+                        add_reid_sightings(frame, crossings)
+
 
 
 
 
+            overlay_start = time.perf_counter()
 
             # Draw counting line
+            counting_line = vehicle_tracker.counting_line
             cv2.line(frame_copy, counting_line[0], counting_line[1], (0, 0, 255), 2)
             cv2.putText(frame_copy, "Counting Line", 
                        (counting_line[0][0], counting_line[0][1] - 10),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
             
-            # Draw bounding boxes and track IDs
-            for track_id, track_info in tracked_vehicles.items():
-                # Find corresponding detection
-                for det in result['detections']:
-                    centroid = get_centroid(det['bbox'])
-                    if abs(centroid[0] - track_info['last_position'][0]) < 50 and \
-                       abs(centroid[1] - track_info['last_position'][1]) < 50:
-                        x1, y1, x2, y2 = det['bbox']
-                        color = (0, 255, 0) if track_info['counted'] else (255, 0, 0)
-                        cv2.rectangle(frame_copy, (x1, y1), (x2, y2), color, 2)
-                        label = f"ID:{track_id} {det['type']} {det['confidence']}%"
-                        if track_info.get('speed', 0) > 0:
-                            label += f" {track_info['speed']:.1f}km/h"
-                        if track_info['counted']:
-                            label += " [COUNTED]"
-                        cv2.putText(frame_copy, label, (x1, y1 - 10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                        break
+            # Draw bounding boxes and track IDs (the tracker records which track each detection fed)
+            detections = result['detections']
+            confidences = np.round(detections.scores * 100, 2).tolist()
+            for (x1, y1, x2, y2), track_id, confidence in zip(detections.boxes.tolist(),
+                                                              vehicle_tracker.assigned_ids.tolist(), confidences):
+                track_info = tracked_vehicles.get(track_id)
+                if track_info is None:
+                    continue
+                color = (0, 255, 0) if track_info['counted'] else (255, 0, 0)
+                cv2.rectangle(frame_copy, (x1, y1), (x2, y2), color, 2)
+                label = f"ID:{track_id} {track_info['type']} {confidence}%"
+                if track_info.get('speed', 0) > 0:
+                    label += f" {track_info['speed']:.1f}km/h"
+                if track_info['counted']:
+                    label += " [COUNTED]"
+                cv2.putText(frame_copy, label, (x1, y1 - 10), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
-            # Store the frame with detections
-            with frame_lock:
-                current_frame_with_detections = frame_copy.copy()
+            STAGE_LATENCY.observe(time.perf_counter() - overlay_start, stream=STREAM_ID, stage='overlay')
+
+            # Publish the frame with detections (frame_copy is not touched again)
+            frame_state.publish({
+                'frame': frame_copy,
+                'position': frame_idx,
+                'frames': total_frames,
+                'fps': fps_local_cap
+            })
             
+            zone_metrics = None
+            zones = zone_set
+            if zones is not None:
+                with STAGE_LATENCY.time(stream=STREAM_ID, stage='zones'):
+                    zone_metrics = zones.measure(frame.shape, result['detections'].boxes, tracked_vehicles,
+                                                 vehicle_tracker.pixel_to_meter_ratio)
+
+            stats_start = time.perf_counter()
+
             # Calculate speed statistics
             speeds = []
             speeds_by_type = defaultdict(list)
@@ -609,9 +750,7 @@ def detection_loop():
                     speed = track_info['speed']
                     speeds.append(speed)
                     vehicle_type = track_info.get('type', 'car')
-                    # Map singular type to plural key for consistency
-                    type_mapping = {'car': 'cars', 'truck': 'trucks', 'bus': 'buses', 'bike': 'bikes'}
-                    plural_type = type_mapping.get(vehicle_type, 'cars')
+                    plural_type = TYPE_MAPPING.get(vehicle_type, 'cars')
                     speeds_by_type[plural_type].append(speed)
                     
                     if speed > speed_limit_kmh:
@@ -651,24 +790,125 @@ def detection_loop():
                     }
                 
                 # Update recent detections (keep last 10)
-                for det in result['detections']:
-                    det['timestamp'] = time.strftime('%H:%M:%S')
-                    det['id'] = int(time.time() * 1000)
-
                 current_stats['recent_detections'] = result['detections'][:10]
+                current_stats['detected_at'] = time.time()
 
                 # Update structured traffic data (lightweight operation)
-                traffic_data.update_from_stats(current_stats)
+                traffic_data.update_from_stats(current_stats, zone_metrics)
+                forecaster.observe(forecast_row, VEHICLE_COUNT, traffic_data.vehicle_count)
+                if traffic_data.average_speed > 0:
+                    forecaster.observe(forecast_row, AVERAGE_SPEED, traffic_data.average_speed)
+                update_forecast()
 
-                # Update signal controller with current congestion level
+                # Update signal controller with current congestion level and queue
                 signal_controller.update_congestion(traffic_data.congestion_level)
+                signal_controller.update_queue(traffic_data.queue_length_m or 0)
                 signal_controller.advance_phase()
 
+                publish_stats()
+                traffic_state.publish_if_changed(traffic_data.to_dict(), key=traffic_key)
+                publish_signal_state()
+
+            STAGE_LATENCY.observe(time.perf_counter() - stats_start, stream=STREAM_ID, stage='stats')
+            FRAMES_PROCESSED.inc(stream=STREAM_ID)
+            now = time.perf_counter()
+            if last_frame_time is not None and now > last_frame_time:
+                instant_fps = 1.0 / (now - last_frame_time)
+                fps_ewma = instant_fps if fps_ewma == 0.0 else 0.9 * fps_ewma + 0.1 * instant_fps
+                EFFECTIVE_FPS.set(round(fps_ewma, 2), stream=STREAM_ID)
+                inference_engine.record_frame(STREAM_ID, now - last_frame_time)
+            last_frame_time = now
+            frame_profiler.frame_end()
+            if checkpointer is not None:
+                checkpointer.frame_boundary()
+
             time.sleep(0.033)  # ~30 FPS
         except Exception as e:
             print(f"Error in detection_loop: {e}")
+            PIPELINE_ERRORS.inc(stream=STREAM_ID, stage='detection_loop')
             # Avoid tight crash loops
             time.sleep(0.5)
+        finally:
+            # Hand the buffer back to the decode thread's pool
+            source.release(captured)
+            captured = None
+
+    EFFECTIVE_FPS.set(0, stream=STREAM_ID)
+    inference_engine.unregister_stream(STREAM_ID, tuner)
+    if recorder is not None:
+        print(f"Recorded {recorder.frames_written} frames to {recorder.path}")
+        recorder.close()
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Export pipeline metrics in Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/admin/profile/sample', methods=['POST'])
+def profile_sample():
+    """Run a time-boxed sampling profiler and return collapsed stacks plus a top-N table
+
+    Body: {"duration": seconds, "interval_ms": 5, "thread": "detection"|"all", "top": 20}
+    """
+    try:
+        data = request.json or {}
+        duration = min(float(data.get('duration', 5)), MAX_PROFILE_SECONDS)
+        interval = max(float(data.get('interval_ms', 5)), 1.0) / 1000.0
+        top = int(data.get('top', 20))
+        if data.get('thread', 'detection') == 'all':
+            thread_ids = None
+        else:
+            if detection_thread is None or not detection_thread.is_alive():
+                return jsonify({'error': 'Detection loop is not running'}), 400
+            thread_ids = {detection_thread.ident}
+
+        result = sampling_profiler.sample(duration, interval, thread_ids, top)
+        return jsonify({'success': True, 'data': result})
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/profile/frames', methods=['POST'])
+def profile_frames():
+    """Deterministically profile the next N frames of the detection loop
+
+    Body: {"frames": 30, "timeout": seconds, "top": 20}
+    """
+    try:
+        data = request.json or {}
+        frames = max(1, int(data.get('frames', 30)))
+        timeout = min(float(data.get('timeout', 30)), MAX_PROFILE_SECONDS)
+        top = int(data.get('top', 20))
+        if detection_thread is None or not detection_thread.is_alive():
+            return jsonify({'error': 'Detection loop is not running'}), 400
+
+        result = frame_profiler.profile_frames(frames, timeout, top)
+        if not result['completed']:
+            return jsonify({'error': f"Timed out after {result['frames']} of {frames} frames"}), 504
+        return jsonify({'success': True, 'data': result})
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/checkpoint', methods=['GET'])
+def get_checkpoint_status():
+    """Get checkpoint settings and the result of the last write"""
+    if checkpointer is None:
+        return jsonify({'success': True, 'data': None})
+    return jsonify({'success': True, 'data': checkpointer.status()})
+
+@app.route('/api/admin/checkpoint', methods=['POST'])
+def save_checkpoint():
+    """Write a checkpoint now (e.g. right before a redeploy)"""
+    if checkpointer is None:
+        return jsonify({'error': 'Checkpointing is disabled'}), 400
+    try:
+        checkpointer.save()
+        return jsonify({'success': True, 'data': checkpointer.status()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -700,7 +940,7 @@ def detect_image():
             return jsonify({'error': 'Invalid image format'}), 400
         
         # Process frame
-        result = process_frame(frame)
+        result = process_frame(frame, stream='image-upload')
         if result is None:
             return jsonify({'error': 'Detection failed'}), 500
         
@@ -713,58 +953,136 @@ def detect_image():
                 'bikes': result['counts'].get('bike', 0),
                 'total': result['total'],
                 'confidence': result['confidence'],
-                'detections': result['detections']
+                'detections': result['detections'].to_list()
             }
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def join_detection_thread(timeout=DETECTION_JOIN_TIMEOUT_S):
+    """Wait for the previous detection loop to exit; True once no loop is running"""
+    thread = detection_thread
+    if thread is None or thread is threading.current_thread():
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
+
 @app.route('/api/detect/start', methods=['POST'])
 def start_detection():
     """Start real-time detection from video source"""
-    global is_detecting, video_cap, detection_thread, current_frame_with_detections
+    global is_detecting, frame_source, detection_thread, timeline_job
     
+    source = None
+    recorder = None
+    started = False
     try:
         data = request.json
-        video_source = data.get('source', 0)  # 0 for webcam, or URL/path
+        video_source = data.get('source', 0)  # 0 for webcam, URL/path, or 'synthetic[:WxH@FPS]'
+        record = data.get('record')  # true or a file name: record raw detections for replay.py
         
+        # Recordings only ever go into RECORDINGS_DIR; clients can't pick other paths
+        recording_path = None
+        if isinstance(record, str):
+            name = os.path.basename(record)
+            if not name or name != record or name in ('.', '..'):
+                return jsonify({'error': 'record must be a file name (saved under recordings/)'}), 400
+            recording_path = os.path.join(RECORDINGS_DIR, name)
+        elif record is not None and not isinstance(record, bool):
+            return jsonify({'error': 'record must be true or a file name'}), 400
+        elif record:
+            recording_path = os.path.join(RECORDINGS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.tdl')
+
         if is_detecting:
             return jsonify({'error': 'Detection already running'}), 400
+        # A just-stopped loop may still be finishing its last frame; it must not overlap this session
+        if not join_detection_thread():
+            return jsonify({'error': 'Previous detection session is still shutting down'}), 409
         
-        # Open video source
-        video_cap = cv2.VideoCapture(video_source)
-        if not video_cap.isOpened():
+        # Open video source on its decode thread
+        # Synthetic frames are generated on demand, so never drop them like a live camera's
+        is_file = isinstance(video_source, str) and os.path.isfile(video_source)
+        live = None
+        if isinstance(video_source, str) and video_source.startswith('synthetic'):
+            open_capture = lambda: SyntheticCapture.from_spec(video_source)
+            live = False
+        else:
+            open_capture = lambda: cv2.VideoCapture(video_source)
+            if is_file:
+                live = False  # Don't rely on CAP_PROP_FRAME_COUNT, which some containers leave at 0
+        # File sources get a keyframe index (precise seeks) once the TimelineJob has built it
+        timeline_job = None
+        if is_file:
+            timeline_job = TimelineJob(video_source)
+        job = timeline_job
+        source = FrameSource(open_capture, index_provider=lambda: job.index if job is not None else None,
+                             live=live)
+        source.start()
+        if not source.wait_ready(timeout=30):
+            source.stop()
+            timeline_job = None
             return jsonify({'error': f'Could not open video source: {video_source}'}), 400
+
+        if recording_path is not None:
+            os.makedirs(RECORDINGS_DIR, exist_ok=True)
+            recorder = DetectionLogWriter(recording_path, {
+                'source': str(video_source),
+                'fps': source.fps,
+                'frame_width': source.width,
+                'frame_height': source.height,
+                'counting_line': vehicle_tracker.counting_line,
+                'pixel_to_meter_ratio': vehicle_tracker.pixel_to_meter_ratio,
+                'max_disappeared': vehicle_tracker.max_disappeared,
+                'max_distance': vehicle_tracker.max_distance,
+                'speed_limit_kmh': speed_limit_kmh,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+            })
         
         # Clear stored frame
-        with frame_lock:
-            current_frame_with_detections = None
+        frame_state.publish(None)
+
+        # Keyframe index and thumbnail timeline for file sources
+        minute_counts.clear()
+        if timeline_job is not None:
+            timeline_job.start()
         
+        # Publish the source only once nothing else can fail, so an error never leaks its decode thread
+        frame_source = source
         is_detecting = True
-        detection_thread = threading.Thread(target=detection_loop, daemon=True)
+        detection_thread = threading.Thread(target=detection_loop, args=(source, recorder), daemon=True)
         detection_thread.start()
+        started = True
         
         return jsonify({
             'success': True,
-            'message': 'Detection started'
+            'message': 'Detection started',
+            'recording': recording_path
         })
     except Exception as e:
+        if source is not None and not started:
+            # The session never started: release the capture and anything opened for it
+            source.stop()
+            if frame_source is source:
+                frame_source = None
+                is_detecting = False
+            timeline_job = None
+            if recorder is not None:
+                recorder.close()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/detect/stop', methods=['POST'])
 def stop_detection():
     """Stop real-time detection"""
-    global is_detecting, video_cap, tracked_vehicles, current_frame_with_detections, is_paused
+    global is_detecting, frame_source, tracked_vehicles, is_paused
     
     try:
         is_detecting = False
         is_paused = False
-        if video_cap:
-            video_cap.release()
-            video_cap = None
+        if frame_source:
+            frame_source.stop()  # The decode thread releases the capture
+            frame_source = None
+        join_detection_thread()  # Let the loop finish its frame and close its recorder
         tracked_vehicles.clear()  # Clear tracks when stopping
-        with frame_lock:
-            current_frame_with_detections = None  # Clear stored frame
+        frame_state.publish(None)  # Clear stored frame
         
         return jsonify({
             'success': True,
@@ -799,78 +1117,119 @@ def resume_detection():
 @app.route('/api/detect/seek', methods=['POST'])
 def seek_detection():
     """Seek forward/backward by a number of frames or set absolute position (works for file-based videos)"""
-    global video_cap
     try:
-        if video_cap is None:
-            return jsonify({'error': 'No active video stream'}), 400
         data = request.json or {}
         offset = data.get('offset', None)
         target = data.get('target', None)
-        # Current frame index
-        cur = int(video_cap.get(cv2.CAP_PROP_POS_FRAMES) or 0)
+        if target is None and offset is None:
+            return jsonify({'error': 'offset or target required'}), 400
+
+        source = frame_source
+        if source is None:
+            return jsonify({'error': 'No active video stream'}), 400
+        video_index = timeline_job.index if timeline_job is not None else None
+        if video_index is not None and not video_index.frame_count:
+            video_index = None
+
+        # Current frame index (last frame handed to the detection loop)
+        cur = source.position
         if target is not None:
             target = int(target)
-        elif offset is not None:
-            target = max(0, cur + int(offset))
         else:
-            return jsonify({'error': 'offset or target required'}), 400
+            target = max(0, cur + int(offset))
 
         # Clamp to frame count if available
-        total = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        total = video_index.frame_count if video_index is not None else source.frame_count
         if total > 0:
             target = min(max(0, target), total - 1)
 
-        success = video_cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        # Runs on the decode thread, which drops prefetched frames and repositions the capture
+        success = source.seek(target)
         if not success:
             return jsonify({'error': 'Seek failed or not supported by this stream'}), 400
         return jsonify({'success': True, 'position': target})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/detect/timeline', methods=['GET'])
+def get_timeline():
+    """Thumbnail timeline and per-minute vehicle counts for the scrubber (file sources)"""
+    job = timeline_job
+    if job is None:
+        return jsonify({'error': 'Timeline is only available for video files'}), 400
+
+    index = job.index
+    counts = [{'minute': minute, 'count': count} for minute, count in sorted(minute_counts.items())]
+    return jsonify({
+        'success': True,
+        'data': {
+            'status': job.status,
+            'progress': round(job.progress, 3),
+            'error': job.error,
+            'frames': index.frame_count if index is not None else None,
+            'fps': index.fps if index is not None else None,
+            'duration': index.duration_s if index is not None else None,
+            'keyframes': len(index.keyframes) if index is not None else None,
+            'thumbnails': job.thumbnails if job.strip_jpeg is not None else [],
+            'thumbnail_size': job.thumbnail_size,
+            'strip_url': '/api/detect/timeline/strip.jpg' if job.strip_jpeg is not None else None,
+            'minute_counts': counts
+        }
+    })
+
+@app.route('/api/detect/timeline/strip.jpg', methods=['GET'])
+def get_timeline_strip():
+    """Thumbnail strip image; tiles are laid out left to right in 'thumbnails' order"""
+    job = timeline_job
+    if job is None or job.strip_jpeg is None:
+        return jsonify({'error': 'Thumbnail strip not available yet'}), 404
+    response = Response(job.strip_jpeg, mimetype='image/jpeg')
+    response.add_etag()
+    return response.make_conditional(request)
+
 @app.route('/api/detect/stats', methods=['GET'])
 def get_stats():
     """Get current detection statistics"""
-    with stats_lock:
-        return jsonify({
-            'success': True,
-            'data': current_stats.copy()
-        })
+    return versioned_response(stats_state, serialize_stats)
+
+def serialize_stats(stats):
+    """Encode a published stats snapshot; detections become JSON dicts only here"""
+    data = dict(stats)
+    detected_at = data.pop('detected_at', None)
+    data['recent_detections'] = data['recent_detections'].to_list(detected_at)
+    return json.dumps({'success': True, 'data': data}, separators=(',', ':')).encode('utf-8')
+
+def serialize_frame(snapshot):
+    """Encode a published frame snapshot as the /api/detect/frame JSON body"""
+    with STAGE_LATENCY.time(stream=STREAM_ID, stage='jpeg_encode'):
+        _, buffer = cv2.imencode('.jpg', snapshot['frame'], [cv2.IMWRITE_JPEG_QUALITY, 85])
+    frame_base64 = base64.b64encode(buffer).decode('utf-8')
+
+    # Include position and duration info when available
+    total = snapshot['frames']
+    fps_local = snapshot['fps']
+    duration = (total / fps_local) if (total and fps_local) else None
+
+    return json.dumps({
+        'success': True,
+        'frame': f'data:image/jpeg;base64,{frame_base64}',
+        'position': snapshot['position'],
+        'frames': total,
+        'fps': fps_local,
+        'duration': duration
+    }).encode('utf-8')
 
 @app.route('/api/detect/frame', methods=['GET'])
 def get_frame():
     """Get current frame with detections (for video preview)"""
-    global current_frame_with_detections, video_cap
-    
     if not is_detecting:
         return jsonify({'error': 'No active video stream'}), 400
     
     try:
-        # Get the stored frame with detections (already processed by detection_loop)
-        with frame_lock:
-            if current_frame_with_detections is None:
-                return jsonify({'error': 'Frame not available yet'}), 503
-            
-            # Make a copy to avoid issues with concurrent access
-            frame = current_frame_with_detections.copy()
-        
-        # Encode frame as JPEG
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        frame_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        # Include position and duration info when available
-        position = int(video_cap.get(cv2.CAP_PROP_POS_FRAMES) or 0) if video_cap is not None else None
-        total = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if video_cap is not None else None
-        fps_local = float(video_cap.get(cv2.CAP_PROP_FPS) or 0) if video_cap is not None else None
-        duration = (total / fps_local) if (total and fps_local) else None
-        
-        return jsonify({
-            'success': True,
-            'frame': f'data:image/jpeg;base64,{frame_base64}',
-            'position': position,
-            'frames': total,
-            'fps': fps_local,
-            'duration': duration
-        })
+        # The frame is published by detection_loop; JPEG encoding happens once per version
+        if frame_state.snapshot()[1] is None:
+            return jsonify({'error': 'Frame not available yet'}), 503
+        return versioned_response(frame_state, serialize_frame)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -879,25 +1238,24 @@ def get_frame():
 @app.route('/api/counting/line', methods=['POST'])
 def set_counting_line():
     """Set the counting line coordinates"""
-    global counting_line
-    
     try:
         data = request.json
         if 'start' not in data or 'end' not in data:
             return jsonify({'error': 'start and end coordinates required'}), 400
         
-        counting_line = [tuple(data['start']), tuple(data['end'])]
+        vehicle_tracker.counting_line = [tuple(data['start']), tuple(data['end'])]
         
         # Reset counts when line is changed
         with stats_lock:
             current_stats['vehicle_count'] = 0
             current_stats['counts_by_type'] = {'cars': 0, 'trucks': 0, 'buses': 0, 'bikes': 0}
             tracked_vehicles.clear()
+            publish_stats()
         
         return jsonify({
             'success': True,
             'message': 'Counting line updated',
-            'line': counting_line
+            'line': vehicle_tracker.counting_line
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -907,7 +1265,40 @@ def get_counting_line():
     """Get current counting line coordinates"""
     return jsonify({
         'success': True,
-        'line': counting_line
+        'line': vehicle_tracker.counting_line
+    })
+
+@app.route('/api/zones', methods=['POST'])
+def set_zones():
+    """Configure polygon measurement zones
+
+    Body: {"zones": [{"id": "north", "polygon": [[x, y], ...], "stop_line": [[x, y], [x, y]]}]}
+    An empty list removes all zones.
+    """
+    global zone_set
+    try:
+        data = request.json or {}
+        zones = data.get('zones')
+        if zones is None:
+            return jsonify({'error': 'zones required'}), 400
+        zone_set = ZoneSet(zones) if zones else None
+        return jsonify({
+            'success': True,
+            'message': 'Zones updated',
+            'zones': zone_set.to_config() if zone_set is not None else []
+        })
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid zones: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/zones', methods=['GET'])
+def get_zones():
+    """Get configured zones and their latest measurements"""
+    return jsonify({
+        'success': True,
+        'zones': zone_set.to_config() if zone_set is not None else [],
+        'metrics': traffic_data.zones
     })
 
 @app.route('/api/counting/reset', methods=['POST'])
@@ -919,6 +1310,7 @@ def reset_count():
         current_stats['vehicle_count'] = 0
         current_stats['counts_by_type'] = {'cars': 0, 'trucks': 0, 'buses': 0, 'bikes': 0}
         tracked_vehicles.clear()
+        publish_stats()
     
     return jsonify({
         'success': True,
@@ -928,15 +1320,13 @@ def reset_count():
 @app.route('/api/speed/calibrate', methods=['POST'])
 def calibrate_speed():
     """Calibrate pixel-to-meter ratio for speed calculation"""
-    global pixel_to_meter_ratio
-    
     try:
         data = request.json
         ratio = data.get('pixel_to_meter_ratio')
         speed_limit = data.get('speed_limit_kmh')
         
         if ratio is not None:
-            pixel_to_meter_ratio = float(ratio)
+            vehicle_tracker.pixel_to_meter_ratio = float(ratio)
         
         if speed_limit is not None:
             global speed_limit_kmh
@@ -945,7 +1335,7 @@ def calibrate_speed():
         return jsonify({
             'success': True,
             'message': 'Speed calibration updated',
-            'pixel_to_meter_ratio': pixel_to_meter_ratio,
+            'pixel_to_meter_ratio': vehicle_tracker.pixel_to_meter_ratio,
             'speed_limit_kmh': speed_limit_kmh
         })
     except Exception as e:
@@ -961,35 +1351,163 @@ def get_speed_stats():
             'speed_limit_kmh': speed_limit_kmh
         })
 
+@app.route('/api/inference', methods=['GET'])
+def get_inference_settings():
+    """Get inference profiles, auto-tuner state per stream and thread settings"""
+    if inference_engine is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    return jsonify({'success': True, 'data': inference_engine.status()})
+
+@app.route('/api/inference', methods=['POST'])
+def configure_inference():
+    """Configure inference profiles
+
+    Body (all optional): {"target_fps": 15, "auto_tune": true, "profile": "416",
+                          "channels_last": false, "threads": 0}
+    Setting "profile" pins that profile and disables auto-tuning; "threads": 0 restores
+    the automatic per-stream split.
+    """
+    if inference_engine is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    try:
+        data = request.json or {}
+        inference_engine.configure(
+            target_fps=data.get('target_fps'),
+            auto_tune=data.get('auto_tune'),
+            profile=data.get('profile'),
+            channels_last=data.get('channels_last'),
+            threads=data.get('threads')
+        )
+        return jsonify({'success': True, 'data': inference_engine.status()})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/traffic/data', methods=['GET'])
 def get_traffic_data():
     """Get structured traffic management data"""
-    return jsonify({
-        'success': True,
-        'data': traffic_data.to_dict()
-    })
+    return versioned_response(traffic_state)
+
+@app.route('/api/traffic/forecast', methods=['GET'])
+def get_traffic_forecast():
+    """Get 5/10/15 minute volume, speed and congestion forecasts per intersection"""
+    if forecast_state.snapshot()[1] is None:
+        return jsonify({'error': 'Forecast not available yet (needs one complete time bin)'}), 503
+    return versioned_response(forecast_state)
+
+@app.route('/api/signal/forecast', methods=['POST'])
+def configure_signal_forecast():
+    """Enable/disable forecast-based green time adjustment
+
+    Body: {"enabled": true, "horizon_minutes": 10}
+    """
+    try:
+        data = request.json or {}
+        if 'enabled' in data:
+            signal_controller.forecast_enabled = bool(data['enabled'])
+        if 'horizon_minutes' in data:
+            minutes = int(data['horizon_minutes'])
+            if minutes not in FORECAST_HORIZONS_MINUTES:
+                return jsonify({'error': f'horizon_minutes must be one of {list(FORECAST_HORIZONS_MINUTES)}'}), 400
+            signal_controller.forecast_horizon_minutes = minutes
+        publish_signal_state()  # forecast_congestion and green_time depend on these
+        return jsonify({
+            'success': True,
+            'enabled': signal_controller.forecast_enabled,
+            'horizon_minutes': signal_controller.forecast_horizon_minutes
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reid/travel-times', methods=['GET'])
+def get_travel_times():
+    """Corridor travel times from vehicles re-identified between cameras
+
+    Query: ?since=<seconds> limits the summary to recent matches.
+    """
+    since = request.args.get('since', type=float)
+    return jsonify({'success': True, 'data': reid_index.travel_times(since)})
+
+@app.route('/api/reid/sightings', methods=['POST'])
+def add_remote_sightings():
+    """Add sightings from another camera's backend to the shared index
+
+    Body: {"sightings": [{"stream": "north-cam", "track_id": 12, "type": "car",
+                          "embedding": [...], "timestamp": unix_seconds}]}
+    Returns the travel-time match (or null) for each sighting.
+    """
+    try:
+        data = request.json or {}
+        # Validate the whole batch first so a bad entry never leaves it half-indexed
+        sightings = []
+        for i, sighting in enumerate(data.get('sightings', [])):
+            try:
+                vehicle_type = sighting['type']
+                if vehicle_type not in VEHICLE_CATEGORIES:
+                    raise ValueError(f"type must be one of {list(VEHICLE_CATEGORIES)}")
+                embedding = np.asarray(sighting['embedding'], dtype=np.float32)
+                if embedding.shape != (reid_index.dim,) or not np.isfinite(embedding).all():
+                    raise ValueError(f'embedding must have {reid_index.dim} finite values')
+                timestamp = sighting.get('timestamp')
+                sightings.append((str(sighting['stream']), int(sighting.get('track_id', -1)), vehicle_type,
+                                  embedding, None if timestamp is None else float(timestamp)))
+            except KeyError as e:
+                return jsonify({'error': f'Invalid sighting {i}: missing {e}'}), 400
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid sighting {i}: {e}'}), 400
+        matches = [add_reid_sighting(*sighting) for sighting in sightings]
+        return jsonify({'success': True, 'matches': matches})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/signal/status', methods=['GET'])
 def get_signal_status():
     """Get current traffic signal status"""
-    return jsonify({
-        'success': True,
-        'data': signal_controller.get_status()
-    })
+    # The countdown advances with the clock, not only when the detection loop runs
+    publish_signal_state()
+    return versioned_response(signal_status_state)
 
 @app.route('/api/signal/decisions', methods=['GET'])
 def get_signal_decisions():
     """Get recent signal controller decisions and alerts"""
-    return jsonify({
-        'success': True,
-        'data': signal_controller.get_decisions()
-    })
+    return versioned_response(signal_decisions_state)
 
 if __name__ == '__main__':
-    print("Loading YOLOv5 model...")
-    if load_model():
-        print("Starting Flask server on http://localhost:5000")
-        app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Smart traffic backend')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--fake-detector', action='store_true',
+                        help="Skip YOLOv5 and use the synthetic-scene detector (pair with source 'synthetic')")
+    parser.add_argument('--inference-ms', type=float, default=0.0,
+                        help='Simulated inference latency of the fake detector')
+    parser.add_argument('--no-debug', action='store_true', help='Disable Flask debug mode and the reloader')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='State checkpoint file')
+    parser.add_argument('--checkpoint-interval', type=float, default=10.0,
+                        help='Seconds between checkpoints (0 disables checkpointing)')
+    parser.add_argument('--no-restore', action='store_true', help='Start from empty state')
+    args = parser.parse_args()
+
+    print("Loading YOLOv5 model..." if not args.fake_detector else "Loading fake detector...")
+    if load_model(args.inference_ms if args.fake_detector else None):
+        # Under the debug reloader only the serving child (WERKZEUG_RUN_MAIN) owns the state
+        if args.checkpoint_interval > 0 and (args.no_debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+            import atexit
+            import signal
+
+            if not args.no_restore:
+                restore_checkpoint(args.checkpoint)
+            checkpointer = Checkpointer(
+                args.checkpoint, capture_checkpoint, args.checkpoint_interval,
+                loop_active=lambda: is_detecting and not is_paused and
+                detection_thread is not None and detection_thread.is_alive())
+            checkpointer.start()
+            atexit.register(checkpointer.stop)
+            # Redeploys send SIGTERM; exit normally so the final checkpoint is written
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Starting Flask server on http://localhost:{args.port}")
+        app.run(host='0.0.0.0', port=args.port, debug=not args.no_debug, threaded=True)
     else:
         print("Failed to load model. Please check your setup.")
 
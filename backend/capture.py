@@ -0,0 +1,243 @@
+import threading
+from collections import deque
+
+import cv2
+
+
+class CapturedFrame:
+    """A decoded frame in a pooled buffer plus metadata cached by the decode thread
+
+    index: frame number in the POS_FRAMES convention (1 for the first frame)
+    pos_msec: presentation time in the video timebase (0 if the source has none)
+    fps: source frame rate (0 if unknown)
+    generation: bumped by every seek, so stale frames can be told apart
+    """
+    __slots__ = ('image', 'index', 'pos_msec', 'fps', 'generation')
+
+    def __init__(self, image, index, pos_msec, fps, generation):
+        self.image = image
+        self.index = index
+        self.pos_msec = pos_msec
+        self.fps = fps
+        self.generation = generation
+
+
+class FrameSource(threading.Thread):
+    """Owns a VideoCapture on a dedicated decode thread and prefetches into a buffer pool
+
+    No other thread touches the capture object. Consumers take frames with
+    read() and must hand each one back with release() once they are done
+    with its image; decoding reuses those buffers via read(image=buf).
+    Seeks are queued to the decode thread, which drops prefetched frames and
+    repositions the capture between reads.
+
+    File sources block when the pool is full (backpressure, nothing is
+    skipped). Live sources instead recycle the oldest prefetched frame so
+    consumers always get the freshest one; live=None treats sources without
+    a frame count as live.
+
+    open_capture: callable returning an opened capture (cv2.VideoCapture or compatible)
+    index_provider: optional callable returning a VideoIndex (or None) for exact
+    seeks and presentation times without per-frame property queries.
+    """
+    def __init__(self, open_capture, pool_size=4, index_provider=None, live=None):
+        super().__init__(daemon=True, name='frame-source')
+        self.open_capture = open_capture
+        self.pool_size = max(2, pool_size)
+        self.index_provider = index_provider or (lambda: None)
+        self._live = live
+        # Metadata cached at open; safe to read from any thread
+        self.fps = 0.0
+        self.frame_count = 0
+        self.width = 0
+        self.height = 0
+        self.position = 0  # Index of the last frame delivered by read()
+        self.error = None
+        self.frames_decoded = 0
+        self.frames_dropped = 0  # Live sources: prefetched frames replaced by newer ones
+        self.read_failures = 0  # Reads that failed before the last known frame
+        self.at_end = False  # File source hit the end of the stream (until the next seek)
+        self._ready = threading.Event()
+        self._cond = threading.Condition()
+        self._queue = deque()  # Prefetched CapturedFrames, oldest first
+        self._free = []  # Buffers returned by consumers
+        self._allocated = 0
+        self._generation = 0
+        self._seek_request = None  # [target, done Event, result]
+        self._stopped = False
+
+    @property
+    def queue_depth(self):
+        """Decoded frames waiting to be read"""
+        return len(self._queue)
+
+    @property
+    def live(self):
+        return self.frame_count <= 0 if self._live is None else self._live
+
+    def wait_ready(self, timeout=None):
+        """Block until the capture is opened (or failed); True if it is usable"""
+        self._ready.wait(timeout)
+        return self._ready.is_set() and self.error is None
+
+    def read(self, timeout=1.0):
+        """Next prefetched frame, or None on timeout/stop; release() it when done"""
+        with self._cond:
+            if not self._queue and not self._stopped:
+                self._cond.wait_for(lambda: self._queue or self._stopped, timeout)
+            if not self._queue:
+                return None
+            frame = self._queue.popleft()
+            self.position = frame.index
+            self._cond.notify_all()
+            return frame
+
+    def release(self, frame):
+        """Return a frame's buffer to the pool"""
+        if frame is None or frame.image is None:
+            return
+        with self._cond:
+            self._free.append(frame.image)
+            frame.image = None
+            self._cond.notify_all()
+
+    def seek(self, target, timeout=10.0):
+        """Reposition so the next frame read() returns is `target` (0-based); True on success"""
+        request = [int(target), threading.Event(), False]
+        with self._cond:
+            if self._stopped:
+                return False
+            self._seek_request = request
+            self._cond.notify_all()
+        request[1].wait(timeout)
+        return request[2]
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def _can_decode(self):
+        if self._free or self._allocated < self.pool_size:
+            return True
+        return self.live and bool(self._queue)
+
+    def _take_buffer(self):
+        """Caller holds _cond and checked _can_decode()"""
+        if self._free:
+            return self._free.pop()
+        if self._allocated < self.pool_size:
+            self._allocated += 1
+            return None  # read() allocates it; the array is reused from then on
+        self.frames_dropped += 1
+        return self._queue.popleft().image  # Live: recycle the stalest prefetched frame
+
+    def _do_seek(self, cap, request):
+        target, done, _ = request
+        try:
+            with self._cond:
+                while self._queue:
+                    self._free.append(self._queue.popleft().image)
+                self._generation += 1
+            if self.frame_count > 0:
+                target = min(max(0, target), self.frame_count - 1)
+            index = self.index_provider()
+            if index is not None and index.frame_count:
+                # Jump to the nearest keyframe and decode forward to the exact frame
+                ok = index.seek(cap, target)
+            else:
+                ok = bool(cap.set(cv2.CAP_PROP_POS_FRAMES, target))
+            if ok:
+                self._next_index = target + 1
+                self.at_end = False
+            request[2] = ok
+        except Exception as e:
+            print(f"Seek failed: {e}")
+            request[2] = False
+        finally:
+            done.set()
+
+    def run(self):
+        try:
+            cap = self.open_capture()
+        except Exception as e:
+            cap = None
+            self.error = str(e)
+        if cap is None or not cap.isOpened():
+            self.error = self.error or 'Could not open video source'
+            with self._cond:
+                self._stopped = True
+                self._cond.notify_all()
+            self._ready.set()
+            return
+
+        self.fps = float(cap.get(cv2.CAP_PROP_FPS) or 0)
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        self._next_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES) or 0) + 1
+        self._ready.set()
+
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopped or self._seek_request is not None
+                                        or self._can_decode())
+                    if self._stopped:
+                        break
+                    request, self._seek_request = self._seek_request, None
+                    if request is None:
+                        buffer = self._take_buffer()
+                        generation = self._generation
+                if request is not None:
+                    self._do_seek(cap, request)
+                    continue
+
+                ret, image = cap.read(image=buffer) if buffer is not None else cap.read()
+                if not ret:
+                    # Files end at the first failed read (retrying doesn't help, and
+                    # CAP_PROP_FRAME_COUNT is only an estimate); it is a decode failure only
+                    # if the index says frames remain. Live sources retry.
+                    if self.live:
+                        at_end = 0 < self.frame_count < self._next_index
+                        failed = not at_end
+                    else:
+                        index = self.index_provider()
+                        at_end = True
+                        failed = index is not None and self._next_index <= index.frame_count
+                    if failed:
+                        self.read_failures += 1
+                    with self._cond:
+                        if buffer is not None:
+                            self._free.append(buffer)
+                        else:
+                            self._allocated -= 1
+                        self.at_end = at_end
+                        # At the end wait for a seek; after a decode failure retry shortly
+                        self._cond.wait_for(lambda: self._stopped or self._seek_request is not None,
+                                            None if at_end else 0.1)
+                    continue
+
+                frame_idx = self._next_index
+                self._next_index += 1
+                index = self.index_provider()
+                if index is not None and 0 < frame_idx <= index.frame_count:
+                    pos_msec = float(index.pts_ms[frame_idx - 1])
+                else:
+                    pos_msec = float(cap.get(cv2.CAP_PROP_POS_MSEC) or 0)
+
+                with self._cond:
+                    if generation != self._generation:
+                        self._free.append(image)  # A seek happened while decoding; drop it
+                        continue
+                    self._queue.append(CapturedFrame(image, frame_idx, pos_msec, self.fps, generation))
+                    self.frames_decoded += 1
+                    self._cond.notify_all()
+        finally:
+            cap.release()
+            with self._cond:
+                self._stopped = True
+                self._queue.clear()
+                self._cond.notify_all()
@@ -0,0 +1,174 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+
+# File layout:
+#   MAGIC | u32 header length | JSON header | array payload | u32 CRC32 of everything before it
+# The header holds scalar state plus {'arrays': {name: {'dtype', 'shape', 'offset', 'nbytes'}}}
+# describing raw little-endian array bytes in the payload.
+MAGIC = b'TCKPT\x00\x01\x00'
+
+
+def _dtype_from_descr(descr):
+    """Rebuild a dtype from its JSON round-tripped str or structured descr"""
+    if isinstance(descr, str):
+        return np.dtype(descr)
+    return np.dtype([(f[0], f[1]) if len(f) == 2 else (f[0], f[1], tuple(f[2])) for f in descr])
+
+
+def encode_checkpoint(header, arrays):
+    """Serialize scalar state (JSON-able dict) and named NumPy arrays into bytes"""
+    header = dict(header)
+    layout, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.byteorder == '>':
+            array = array.astype(array.dtype.newbyteorder('<'))
+        descr = array.dtype.descr if array.dtype.fields else array.dtype.str
+        layout[name] = {'dtype': descr, 'shape': list(array.shape),
+                        'offset': offset, 'nbytes': array.nbytes}
+        chunks.append(array.tobytes())
+        offset += array.nbytes
+    header['arrays'] = layout
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    body = b''.join([MAGIC, struct.pack('<I', len(header_bytes)), header_bytes] + chunks)
+    return body + struct.pack('<I', zlib.crc32(body))
+
+
+def decode_checkpoint(data):
+    """Inverse of encode_checkpoint; arrays are read-only views into data"""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a checkpoint file')
+    if len(data) < len(MAGIC) + 8:
+        raise ValueError('Truncated checkpoint')
+    (crc,) = struct.unpack_from('<I', data, len(data) - 4)
+    if zlib.crc32(memoryview(data)[:-4]) != crc:
+        raise ValueError('Checkpoint checksum mismatch')
+    pos = len(MAGIC)
+    (header_len,) = struct.unpack_from('<I', data, pos)
+    pos += 4
+    header = json.loads(data[pos:pos + header_len].decode('utf-8'))
+    pos += header_len
+    arrays = {}
+    for name, info in header.pop('arrays', {}).items():
+        dtype = _dtype_from_descr(info['dtype'])
+        count = info['nbytes'] // dtype.itemsize if dtype.itemsize else 0
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=pos + info['offset'])
+        arrays[name] = array.reshape(info['shape'])
+    return header, arrays
+
+
+def write_checkpoint(path, header, arrays):
+    """Atomically replace path: write a temp file, fsync, rename"""
+    data = encode_checkpoint(header, arrays)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_checkpoint(path):
+    with open(path, 'rb') as f:
+        return decode_checkpoint(f.read())
+
+
+class Checkpointer(threading.Thread):
+    """Background thread that snapshots live state every interval_s seconds
+
+    capture() -> (header, arrays) must copy whatever it reads. While the
+    frame loop is running the snapshot is taken at a frame boundary (the loop
+    calls frame_boundary() once per frame), so counters and tracks are
+    consistent with each other; the loop only pays for the copy, while
+    encoding and disk I/O happen on this thread. When the loop is idle,
+    capture() runs on this thread directly.
+    """
+    def __init__(self, path, capture, interval_s=10.0, loop_active=None):
+        super().__init__(daemon=True, name='checkpointer')
+        self.path = path
+        self.capture = capture
+        self.interval_s = interval_s
+        self.loop_active = loop_active or (lambda: False)
+        self.last_saved = None  # Wall-clock time of the last successful write
+        self.last_size = 0
+        self.last_duration_s = 0.0
+        self.last_error = None
+        self._stop_event = threading.Event()
+        self._save_lock = threading.Lock()
+        self._requested = threading.Event()
+        self._captured = threading.Event()
+        self._snapshot = None
+
+    def frame_boundary(self):
+        """Called by the frame loop between frames; captures if a snapshot is pending"""
+        if not self._requested.is_set():
+            return
+        self._requested.clear()
+        try:
+            self._snapshot = self.capture()
+        except Exception as e:
+            self._snapshot = None
+            self.last_error = str(e)
+        self._captured.set()
+
+    def _take_snapshot(self):
+        if self.loop_active():
+            self._captured.clear()
+            self._requested.set()
+            if self._captured.wait(timeout=max(1.0, self.interval_s)):
+                snapshot, self._snapshot = self._snapshot, None
+                if snapshot is not None:
+                    return snapshot
+            self._requested.clear()
+            if self.loop_active():
+                return None  # Loop is stuck mid-frame; try again next interval
+        return self.capture()
+
+    def save(self):
+        """Snapshot and write now; returns bytes written (0 if skipped)"""
+        with self._save_lock:
+            started = time.perf_counter()
+            snapshot = self._take_snapshot()
+            if snapshot is None:
+                return 0
+            header, arrays = snapshot
+            self.last_size = write_checkpoint(self.path, header, arrays)
+            self.last_duration_s = time.perf_counter() - started
+            self.last_saved = time.time()
+            self.last_error = None
+            return self.last_size
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            try:
+                self.save()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Checkpoint failed: {e}")
+
+    def stop(self, final_save=True):
+        self._stop_event.set()
+        if final_save:
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Final checkpoint failed: {e}")
+
+    def status(self):
+        return {
+            'path': self.path,
+            'interval_s': self.interval_s,
+            'last_saved': self.last_saved,
+            'last_size_bytes': self.last_size,
+            'last_duration_ms': round(self.last_duration_s * 1000, 2),
+            'last_error': self.last_error
+        }
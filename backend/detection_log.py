@@ -0,0 +1,113 @@
+import json
+import struct
+
+import numpy as np
+
+from tracker import VEHICLE_CATEGORIES
+from detections import Detections
+
+
+# File layout:
+#   MAGIC | u32 header length | JSON header
+#   repeated frame records:
+#     f8 timestamp_s | u32 frame_idx | u16 detection count | count * DETECTION_DTYPE
+MAGIC = b'TDLOG\x00\x01\x00'
+FRAME_HEADER = struct.Struct('<dIH')
+DETECTION_DTYPE = np.dtype([
+    ('bbox', '<i2', (4,)),   # x1, y1, x2, y2 in pixels
+    ('confidence', '<f4'),   # percent
+    ('category', 'u1'),      # index into the header's categories list
+])
+
+
+class DetectionLogWriter:
+    """Append-only binary log of raw per-frame detections and video timestamps"""
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.frames_written = 0
+        header = dict(metadata or {})
+        header['categories'] = list(VEHICLE_CATEGORIES)
+        header_bytes = json.dumps(header).encode('utf-8')
+        self._file = open(path, 'wb', buffering=1 << 16)
+        self._file.write(MAGIC)
+        self._file.write(struct.pack('<I', len(header_bytes)))
+        self._file.write(header_bytes)
+
+    def write_frame(self, frame_idx, timestamp_s, detections):
+        """Append one frame of Detections as produced by process_frame"""
+        records = np.empty(len(detections), dtype=DETECTION_DTYPE)
+        records['bbox'] = detections.boxes
+        records['confidence'] = detections.scores * 100.0
+        records['category'] = detections.categories
+        self.write_records(frame_idx, timestamp_s, records)
+
+    def write_records(self, frame_idx, timestamp_s, records):
+        """Append one frame of already-encoded DETECTION_DTYPE records"""
+        records = np.ascontiguousarray(records, dtype=DETECTION_DTYPE)
+        self._file.write(FRAME_HEADER.pack(float(timestamp_s), int(frame_idx), len(records)))
+        self._file.write(records.tobytes())
+        self.frames_written += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class DetectionLog:
+    """A detection log loaded into memory for fast sequential replay"""
+    def __init__(self, header, frame_indices, timestamps, offsets, records):
+        self.header = header
+        self.frame_indices = frame_indices  # (F,) uint32
+        self.timestamps = timestamps        # (F,) float64
+        self.offsets = offsets              # (F + 1,) start of each frame's rows in records
+        self.records = records              # (N,) DETECTION_DTYPE
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a detection log')
+        pos = len(MAGIC)
+        (header_len,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        header = json.loads(data[pos:pos + header_len].decode('utf-8'))
+        pos += header_len
+
+        frame_indices, timestamps, offsets, chunks = [], [], [0], []
+        itemsize = DETECTION_DTYPE.itemsize
+        end = len(data)
+        while pos + FRAME_HEADER.size <= end:
+            timestamp_s, frame_idx, count = FRAME_HEADER.unpack_from(data, pos)
+            pos += FRAME_HEADER.size
+            size = count * itemsize
+            if pos + size > end:
+                break  # Truncated trailing record (e.g. process killed mid-write)
+            chunks.append(np.frombuffer(data, dtype=DETECTION_DTYPE, count=count, offset=pos))
+            pos += size
+            frame_indices.append(frame_idx)
+            timestamps.append(timestamp_s)
+            offsets.append(offsets[-1] + count)
+
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=DETECTION_DTYPE)
+        return cls(header, np.asarray(frame_indices, dtype=np.uint32),
+                   np.asarray(timestamps, dtype=np.float64),
+                   np.asarray(offsets, dtype=np.int64), records)
+
+    def frames(self):
+        """Yield (frame_idx, timestamp_s, Detections) for every frame"""
+        categories = self.header.get('categories', list(VEHICLE_CATEGORIES))
+        detections = Detections.from_records(self.records)
+        if categories != list(VEHICLE_CATEGORIES):
+            # Logs written with a different category order: remap to ours
+            remap = np.array([VEHICLE_CATEGORIES.index(c) for c in categories], dtype=np.uint8)
+            detections.categories = remap[detections.categories]
+        frame_indices = self.frame_indices.tolist()
+        timestamps = self.timestamps.tolist()
+        offsets = self.offsets.tolist()
+        for i in range(len(timestamps)):
+            yield frame_indices[i], timestamps[i], detections[offsets[i]:offsets[i + 1]]
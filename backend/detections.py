@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+
+from tracker import VEHICLE_CATEGORIES
+
+
+# Model labels counted as each vehicle category
+CATEGORY_LABELS = {
+    'car': ('car',),
+    'truck': ('truck',),
+    'bus': ('bus',),
+    'bike': ('bicycle', 'motorcycle'),
+}
+
+
+def build_category_lut(names):
+    """Class id -> index into VEHICLE_CATEGORIES (-1 for non-vehicles) for a model's names"""
+    items = names.items() if isinstance(names, dict) else enumerate(names)
+    items = [(int(class_id), str(label).lower()) for class_id, label in items]
+    lut = np.full(max((class_id for class_id, _ in items), default=-1) + 1, -1, dtype=np.int8)
+    for class_id, label in items:
+        for category, labels in CATEGORY_LABELS.items():
+            if label in labels:
+                lut[class_id] = VEHICLE_CATEGORIES.index(category)
+    return lut
+
+
+class Detections:
+    """One frame's vehicle detections as parallel arrays
+
+    boxes: (N, 4) int32 x1, y1, x2, y2
+    scores: (N,) float32 confidence in [0, 1]
+    categories: (N,) uint8 index into VEHICLE_CATEGORIES
+
+    Filtering, tracking and stats work on the arrays directly; to_list()
+    builds per-detection dicts only for JSON responses.
+    """
+    __slots__ = ('boxes', 'scores', 'categories')
+
+    def __init__(self, boxes, scores, categories):
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.categories = np.asarray(categories, dtype=np.uint8).reshape(-1)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_prediction(cls, pred, category_lut):
+        """Keep vehicle rows of a YOLOv5 prediction (N, 6): x1, y1, x2, y2, conf, class"""
+        pred = np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+        class_ids = pred[:, 5].astype(np.int64)
+        known = (class_ids >= 0) & (class_ids < len(category_lut))
+        categories = np.full(len(pred), -1, dtype=np.int8)
+        categories[known] = category_lut[class_ids[known]]
+        keep = categories >= 0
+        return cls(pred[keep, :4], pred[keep, 4], categories[keep])
+
+    @classmethod
+    def from_records(cls, records):
+        """From detection log records (confidence stored in percent)"""
+        return cls(records['bbox'], records['confidence'] / 100.0, records['category'])
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __eq__(self, other):
+        if not isinstance(other, Detections):
+            return NotImplemented
+        return (np.array_equal(self.boxes, other.boxes) and np.array_equal(self.scores, other.scores)
+                and np.array_equal(self.categories, other.categories))
+
+    __hash__ = None  # Mutable arrays
+
+    def __getitem__(self, index):
+        """Slice or boolean/integer mask; always returns Detections"""
+        return Detections(self.boxes[index], self.scores[index], self.categories[index])
+
+    @property
+    def centroids(self):
+        """(N, 2) integer box centers"""
+        return (self.boxes[:, :2] + self.boxes[:, 2:]) // 2
+
+    def counts(self):
+        """Detections per category as {'car': n, 'truck': n, 'bus': n, 'bike': n}"""
+        counts = np.bincount(self.categories, minlength=len(VEHICLE_CATEGORIES))
+        return dict(zip(VEHICLE_CATEGORIES, counts.tolist()))
+
+    def mean_confidence(self):
+        """Average confidence in percent"""
+        return round(float(self.scores.mean()) * 100, 2) if len(self) else 0.0
+
+    def to_list(self, detected_at=None):
+        """JSON-ready [{'type', 'confidence' (percent), 'bbox'}], stamped with time and id if given"""
+        types = [VEHICLE_CATEGORIES[c] for c in self.categories.tolist()]
+        confidences = np.round(self.scores.astype(np.float64) * 100, 2).tolist()
+        items = [{'type': t, 'confidence': c, 'bbox': b}
+                 for t, c, b in zip(types, confidences, self.boxes.tolist())]
+        if detected_at is not None:
+            stamp = time.strftime('%H:%M:%S', time.localtime(detected_at))
+            detection_id = int(detected_at * 1000)
+            for item in items:
+                item['timestamp'] = stamp
+                item['id'] = detection_id
+        return items
@@ -0,0 +1,181 @@
+import threading
+
+import numpy as np
+
+
+# Series tracked per intersection
+SERIES = ('volume', 'vehicle_count', 'average_speed')
+VOLUME, VEHICLE_COUNT, AVERAGE_SPEED = range(len(SERIES))
+
+
+class SeasonalForecaster:
+    """Online additive Holt-Winters (damped trend) for many intersections at once
+
+    State for every intersection lives in NumPy arrays, so closing a time bin
+    is one vectorized O(1)-per-intersection update and forecasting any
+    horizon is a few array lookups.
+
+    Samples are accumulated per bin with observe(); roll(now) closes every
+    bin that has ended and applies one smoothing step to all intersections.
+    Series with no samples in a bin (e.g. speed with no vehicles) keep their
+    previous state.
+    """
+    def __init__(self, bin_seconds=60, season_bins=1440, alpha=0.1, beta=0.01, gamma=0.3, phi=0.9):
+        self.bin_seconds = bin_seconds
+        self.season_bins = season_bins  # 1440 one-minute bins = daily seasonality
+        self.alpha, self.beta, self.gamma, self.phi = alpha, beta, gamma, phi
+        self.ids = []
+        self._index = {}
+        self._lock = threading.Lock()
+        self._current_bin = None  # Bin number still accumulating samples
+        self._last_closed_bin = None  # Bin number of the last smoothing step
+        n_series = len(SERIES)
+        self.level = np.zeros((0, n_series))
+        self.trend = np.zeros((0, n_series))
+        self.season = np.zeros((0, season_bins, n_series))
+        self.season_shift = np.zeros((0, n_series))  # Lazy renormalization offset (see _step)
+        self.initialized = np.zeros((0, n_series), dtype=bool)
+        self.samples = np.zeros((0, n_series), dtype=np.int64)  # Bins learned per series
+        self._sum = np.zeros((0, n_series))
+        self._count = np.zeros((0, n_series), dtype=np.int64)
+
+    def index_of(self, intersection_id):
+        """Row for an intersection, allocating state on first use"""
+        idx = self._index.get(intersection_id)
+        if idx is not None:
+            return idx
+        with self._lock:
+            idx = self._index.get(intersection_id)
+            if idx is None:
+                idx = len(self.ids)
+                self._grow(idx + 1)
+                self.ids.append(intersection_id)
+                self._index[intersection_id] = idx
+            return idx
+
+    def _grow(self, size):
+        if size <= len(self.level):
+            return
+        capacity = max(size, 2 * len(self.level), 8)
+        extra = capacity - len(self.level)
+        n_series = len(SERIES)
+        self.level = np.concatenate([self.level, np.zeros((extra, n_series))])
+        self.trend = np.concatenate([self.trend, np.zeros((extra, n_series))])
+        self.season = np.concatenate([self.season, np.zeros((extra, self.season_bins, n_series))])
+        self.season_shift = np.concatenate([self.season_shift, np.zeros((extra, n_series))])
+        self.initialized = np.concatenate([self.initialized, np.zeros((extra, n_series), dtype=bool)])
+        self.samples = np.concatenate([self.samples, np.zeros((extra, n_series), dtype=np.int64)])
+        self._sum = np.concatenate([self._sum, np.zeros((extra, n_series))])
+        self._count = np.concatenate([self._count, np.zeros((extra, n_series), dtype=np.int64)])
+
+    def observe(self, idx, series, value, count=1):
+        """Accumulate a sample into the current bin
+
+        For VOLUME pass the number of new vehicles; it is summed per bin.
+        Other series are averaged over the bin's samples.
+        """
+        with self._lock:
+            self._sum[idx, series] += value
+            self._count[idx, series] += count
+
+    def roll(self, now):
+        """Close finished bins; returns True when a smoothing step was applied"""
+        bin_number = int(now // self.bin_seconds)
+        with self._lock:
+            if self._current_bin is None:
+                self._current_bin = bin_number
+                return False
+            if bin_number <= self._current_bin:
+                return False
+            n = len(self.ids)
+            values = self._sum[:n] / np.maximum(self._count[:n], 1)
+            # Volume is a per-bin total; a bin without crossings is a real zero
+            values[:, VOLUME] = self._sum[:n, VOLUME]
+            present = self._count[:n] > 0
+            present[:, VOLUME] = True
+            self._step(values, present, self._current_bin % self.season_bins)
+            self._last_closed_bin = self._current_bin
+            # Bins skipped entirely (e.g. detection stopped) only advance the clock
+            self._current_bin = bin_number
+            self._sum[:] = 0
+            self._count[:] = 0
+            return True
+
+    def _step(self, values, present, season_idx):
+        n = len(values)
+        level, trend, shift = self.level[:n], self.trend[:n], self.season_shift[:n]
+        season = self.season[:n, season_idx] - shift
+        first = present & ~self.initialized[:n]
+        update = present & self.initialized[:n]
+
+        a, b, g, phi = self.alpha, self.beta, self.gamma, self.phi
+        new_level = a * (values - season) + (1 - a) * (level + phi * trend)
+        new_trend = b * (new_level - level) + (1 - b) * phi * trend
+        new_season = g * (values - new_level) + (1 - g) * season
+
+        # Keep the seasonal indices zero-mean so level and season can't drift
+        # against each other: moving delta/m from every index into the level
+        # is applied lazily through season_shift instead of touching all m bins.
+        correction = np.where(update, (new_season - season) / self.season_bins, 0.0)
+        self.level[:n] = np.where(update, new_level + correction, np.where(first, values, level))
+        self.trend[:n] = np.where(update, new_trend, trend)
+        self.season[:n, season_idx] = np.where(update, new_season + shift, self.season[:n, season_idx])
+        self.season_shift[:n] = shift + correction
+        self.initialized[:n] |= present
+        self.samples[:n] += present
+
+    STATE_ARRAYS = ('level', 'trend', 'season', 'season_shift', 'initialized', 'samples', '_sum', '_count')
+
+    def get_state(self):
+        """(scalars, arrays) copy of the model for checkpointing"""
+        with self._lock:
+            n = len(self.ids)
+            scalars = {'ids': list(self.ids), 'current_bin': self._current_bin,
+                       'last_closed_bin': self._last_closed_bin, 'bin_seconds': self.bin_seconds, 'season_bins': self.season_bins}
+            arrays = {name: getattr(self, name)[:n].copy() for name in self.STATE_ARRAYS}
+            return scalars, arrays
+
+    def set_state(self, scalars, arrays):
+        """Restore from get_state(); ignored if the binning differs"""
+        if scalars['bin_seconds'] != self.bin_seconds or scalars['season_bins'] != self.season_bins:
+            return False
+        with self._lock:
+            n = len(scalars['ids'])
+            self.ids = []
+            self._index = {}
+            for name in self.STATE_ARRAYS:
+                current = getattr(self, name)
+                setattr(self, name, np.zeros((0,) + current.shape[1:], dtype=current.dtype))
+            self._grow(n)
+            for name in self.STATE_ARRAYS:
+                getattr(self, name)[:n] = arrays[name]
+            self.ids = list(scalars['ids'])
+            self._index = {intersection_id: i for i, intersection_id in enumerate(self.ids)}
+            self._current_bin = scalars['current_bin']
+            self._last_closed_bin = scalars.get('last_closed_bin')
+        return True
+
+    def forecast(self, horizons_bins, idx=None):
+        """Predicted values (len(idx), len(horizons), n_series) h bins after the last closed bin
+
+        Level, trend and season describe the state after the last closed bin,
+        so h=1 is the bin right after it (normally the one still accumulating).
+        """
+        with self._lock:
+            n = len(self.ids)
+            rows = np.arange(n) if idx is None else np.atleast_1d(idx)
+            if self._last_closed_bin is not None:
+                last_closed = self._last_closed_bin
+            else:
+                last_closed = self._current_bin - 1 if self._current_bin is not None else -1
+            out = np.empty((len(rows), len(horizons_bins), len(SERIES)))
+            for j, h in enumerate(horizons_bins):
+                # Damped trend: phi + phi^2 + ... + phi^h
+                damping = sum(self.phi ** k for k in range(1, h + 1))
+                season = self.season[rows, (last_closed + h) % self.season_bins] - self.season_shift[rows]
+                out[:, j] = self.level[rows] + damping * self.trend[rows] + season
+            out[:, :, VOLUME] = np.maximum(out[:, :, VOLUME], 0)
+            out[:, :, VEHICLE_COUNT] = np.maximum(out[:, :, VEHICLE_COUNT], 0)
+            out[:, :, AVERAGE_SPEED] = np.maximum(out[:, :, AVERAGE_SPEED], 0)
+            ready = self.initialized[rows].all(axis=1)
+            return out, ready
@@ -0,0 +1,216 @@
+import copy
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import torch
+
+
+InferenceProfile = namedtuple('InferenceProfile', ['name', 'size', 'int8'])
+
+# Most accurate first; the auto-tuner walks down this ladder to gain speed
+PROFILES = (
+    InferenceProfile('640', 640, False),
+    InferenceProfile('640-int8', 640, True),
+    InferenceProfile('416', 416, False),
+    InferenceProfile('416-int8', 416, True),
+    InferenceProfile('320', 320, False),
+    InferenceProfile('320-int8', 320, True),
+)
+
+
+def supports_int8(model):
+    """Dynamic int8 quantization only rewrites nn.Linear layers and needs a CPU quantized engine"""
+    if not isinstance(model, torch.nn.Module):
+        return False
+    if not set(torch.backends.quantized.supported_engines) & {'fbgemm', 'qnnpack', 'x86'}:
+        return False
+    return any(isinstance(m, torch.nn.Linear) for m in model.modules())
+
+
+class AutoTuner:
+    """Picks the most accurate profile whose measured FPS meets the target
+
+    Frame times are collected per window; at the end of each window the
+    achieved FPS is stored for the current profile. Below target the tuner
+    steps to a faster profile. With headroom it steps back up unless that
+    profile was measured too slow recently. Measurements expire after
+    reprobe_s, or immediately when invalidate() is called (e.g. the number
+    of streams sharing the CPU changed).
+    """
+    def __init__(self, profiles, target_fps, window=30, headroom=1.25, reprobe_s=120.0):
+        self.profiles = list(profiles)
+        self.target_fps = target_fps
+        self.window = window
+        self.headroom = headroom  # Step up only when fps >= target * headroom
+        self.reprobe_s = reprobe_s
+        self.level = 0
+        self.achieved_fps = 0.0
+        self._frame_times = deque(maxlen=window)
+        self._measured = {}  # level -> (fps, measured_at)
+
+    @property
+    def profile(self):
+        return self.profiles[self.level]
+
+    def invalidate(self):
+        self._measured.clear()
+        self._frame_times.clear()
+
+    def record(self, frame_seconds, now=None):
+        """Add one frame's processing interval; returns True when the profile changed"""
+        self._frame_times.append(frame_seconds)
+        if len(self._frame_times) < self.window:
+            return False
+        now = time.monotonic() if now is None else now
+        fps = len(self._frame_times) / max(sum(self._frame_times), 1e-9)
+        self._frame_times.clear()
+        self.achieved_fps = fps
+        self._measured[self.level] = (fps, now)
+
+        if fps < self.target_fps and self.level < len(self.profiles) - 1:
+            self.level += 1
+            return True
+        if fps >= self.target_fps * self.headroom and self.level > 0:
+            previous = self._measured.get(self.level - 1)
+            if previous is None or previous[0] >= self.target_fps or now - previous[1] > self.reprobe_s:
+                self.level -= 1
+                return True
+        return False
+
+    def to_dict(self):
+        return {
+            'profile': self.profile.name,
+            'target_fps': self.target_fps,
+            'achieved_fps': round(self.achieved_fps, 2),
+            'measured': {self.profiles[level].name: round(fps, 2) for level, (fps, _) in self._measured.items()}
+        }
+
+
+class InferenceEngine:
+    """Runs the detector at a per-stream profile (input size, int8) with optional auto-tuning
+
+    Streams registered with register_stream() get an AutoTuner; other callers
+    (e.g. offline segment workers) use the fixed profile, or the most accurate
+    one. Torch intra-op threads are split evenly between registered streams.
+    """
+    def __init__(self, model, target_fps=10.0, auto_tune=True, fixed_profile=None,
+                 channels_last=False, threads=None):
+        self.model = model
+        self.profiles = [p for p in PROFILES if not p.int8 or supports_int8(model)]
+        self.target_fps = target_fps
+        self.auto_tune = auto_tune
+        self.fixed_profile = fixed_profile  # Profile name used when auto_tune is off
+        self.channels_last = False
+        self.threads = threads  # None: divide base_threads between streams
+        self.base_threads = torch.get_num_threads()
+        self.tuners = {}
+        self._variants = {}  # int8 flag -> model
+        self._lock = threading.Lock()
+        if channels_last:
+            self.set_channels_last(True)
+
+    def _profile(self, name):
+        for profile in self.profiles:
+            if profile.name == name:
+                return profile
+        raise ValueError(f'Unknown or unavailable inference profile: {name}')
+
+    def _variant(self, int8):
+        if not int8:
+            return self.model
+        with self._lock:
+            variant = self._variants.get(int8)
+            if variant is None:
+                variant = torch.ao.quantization.quantize_dynamic(
+                    copy.deepcopy(self.model), {torch.nn.Linear}, dtype=torch.qint8)
+                self._variants[int8] = variant
+            return variant
+
+    def set_channels_last(self, enabled):
+        if isinstance(self.model, torch.nn.Module):
+            fmt = torch.channels_last if enabled else torch.contiguous_format
+            self.model.to(memory_format=fmt)
+            self._variants.clear()  # Rebuilt from the re-laid-out model on demand
+        self.channels_last = bool(enabled)
+
+    def _apply_threads(self):
+        threads = self.threads or max(1, self.base_threads // max(1, len(self.tuners)))
+        torch.set_num_threads(threads)
+
+    def register_stream(self, stream):
+        """Give a stream a fresh AutoTuner; pass the returned tuner to unregister_stream()"""
+        with self._lock:
+            registered = AutoTuner(self.profiles, self.target_fps)
+            self.tuners[stream] = registered
+            for tuner in self.tuners.values():
+                tuner.invalidate()  # CPU share per stream changed
+            self._apply_threads()
+            return registered
+
+    def unregister_stream(self, stream, tuner=None):
+        """Drop a stream's tuner; with tuner given, only if a newer session hasn't replaced it"""
+        with self._lock:
+            current = self.tuners.get(stream)
+            if current is None or (tuner is not None and current is not tuner):
+                return
+            del self.tuners[stream]
+            for tuner in self.tuners.values():
+                tuner.invalidate()
+            self._apply_threads()
+
+    def configure(self, target_fps=None, auto_tune=None, profile=None, channels_last=None, threads=None):
+        """Update settings; profile=name also disables auto-tuning"""
+        if profile is not None:
+            self._profile(profile)
+            self.fixed_profile = profile
+            self.auto_tune = False
+        if auto_tune is not None:
+            self.auto_tune = bool(auto_tune)
+        if channels_last is not None and bool(channels_last) != self.channels_last:
+            self.set_channels_last(channels_last)
+        with self._lock:
+            if target_fps is not None:
+                self.target_fps = float(target_fps)
+                for tuner in self.tuners.values():
+                    tuner.target_fps = self.target_fps
+            if threads is not None:
+                self.threads = int(threads) or None
+                self._apply_threads()
+
+    def profile_for(self, stream):
+        tuner = self.tuners.get(stream)
+        if self.auto_tune and tuner is not None:
+            return tuner.profile
+        if self.fixed_profile is not None:
+            return self._profile(self.fixed_profile)
+        return self.profiles[0]
+
+    def record_frame(self, stream, frame_seconds):
+        """Feed a stream's achieved frame interval to its tuner"""
+        tuner = self.tuners.get(stream)
+        if tuner is None or not self.auto_tune:
+            return False
+        changed = tuner.record(frame_seconds)
+        if changed:
+            print(f"Inference profile for {stream}: {tuner.profile.name} "
+                  f"(achieved {tuner.achieved_fps:.1f} fps, target {tuner.target_fps} fps)")
+        return changed
+
+    def __call__(self, frame, stream=None):
+        profile = self.profile_for(stream)
+        with torch.inference_mode():
+            return self._variant(profile.int8)(frame, size=profile.size)
+
+    def status(self):
+        return {
+            'auto_tune': self.auto_tune,
+            'target_fps': self.target_fps,
+            'fixed_profile': self.fixed_profile,
+            'channels_last': self.channels_last,
+            'threads': torch.get_num_threads(),
+            'cpu_count': os.cpu_count(),
+            'profiles': [p._asdict() for p in self.profiles],
+            'streams': {stream: tuner.to_dict() for stream, tuner in self.tuners.items()}
+        }
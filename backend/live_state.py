@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+
+
+# Distinguishes versions issued by this process from those of a previous run,
+# so a client holding an ETag from before a restart never gets a false 304.
+BOOT_ID = os.urandom(4).hex()
+
+_NO_KEY = object()  # Change key of a snapshot stored by publish(); never equal to a real key
+
+
+class VersionedValue:
+    """A piece of live state with a monotonically increasing version.
+
+    Writers publish immutable snapshots; readers can fetch the latest snapshot,
+    block until a newer version exists (long-poll), or get the serialized body
+    for the current version, which is built at most once per version no matter
+    how many clients poll.
+    """
+    def __init__(self, name, value=None):
+        self.name = name
+        self._cond = threading.Condition()
+        self._version = 0
+        self._value = value
+        self._key = _NO_KEY
+        self._body_version = -1
+        self._body = None
+        self._encoding = None  # (version, Event) while one reader serializes that version
+        self._waiters = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def waiters(self):
+        """Number of readers currently blocked in a long-poll"""
+        return self._waiters
+
+    def etag(self, version=None):
+        """Unquoted strong ETag for the given (or current) version"""
+        if version is None:
+            version = self._version
+        return f'{BOOT_ID}-{self.name}-{version}'
+
+    def publish(self, value):
+        """Store a new snapshot and wake any waiting readers. Returns the new version."""
+        with self._cond:
+            self._value = value
+            self._key = _NO_KEY
+            self._version += 1
+            self._cond.notify_all()
+            return self._version
+
+    def publish_if_changed(self, value, key=None):
+        """Publish only when the value differs from the current snapshot
+
+        key: optional callable(value) -> comparable; compares key(value) with the
+        current snapshot's key instead, e.g. to ignore per-update timestamps.
+        """
+        marker = value if key is None else key(value)
+        with self._cond:
+            if marker == (self._value if key is None else self._key):
+                return self._version
+            self._value = value
+            self._key = _NO_KEY if key is None else marker
+            self._version += 1
+            self._cond.notify_all()
+            return self._version
+
+    def snapshot(self):
+        """Return (version, value) for the latest snapshot"""
+        with self._cond:
+            return self._version, self._value
+
+    def wait_for(self, since, timeout):
+        """Block until version > since or timeout elapses. Returns (version, value)."""
+        with self._cond:
+            self._waiters += 1
+            try:
+                self._cond.wait_for(lambda: self._version > since, timeout=timeout)
+            finally:
+                self._waiters -= 1
+            return self._version, self._value
+
+    def body(self, serialize=None):
+        """Return (version, bytes) with the serialized body cached per version.
+
+        serialize: callable(value) -> bytes. Defaults to compact JSON of
+        {'success': True, 'data': value}.
+        """
+        while True:
+            with self._cond:
+                version, value = self._version, self._value
+                if self._body_version == version:
+                    return version, self._body
+                pending = self._encoding
+                encoder = pending is None or pending[0] != version
+                if encoder:
+                    pending = self._encoding = (version, threading.Event())
+            if encoder:
+                break
+            # Another reader is already serializing this version; wait for its result
+            pending[1].wait()
+            with self._cond:
+                if self._body_version == version:
+                    return version, self._body
+            # Its serialize failed or a newer version was published; look again
+
+        # Serialize outside the condition so writers are never blocked on it
+        try:
+            if serialize is None:
+                data = json.dumps({'success': True, 'data': value}, separators=(',', ':')).encode('utf-8')
+            else:
+                data = serialize(value)
+            with self._cond:
+                # Never replace the body of a newer version
+                if version > self._body_version:
+                    self._body_version = version
+                    self._body = data
+        finally:
+            with self._cond:
+                if self._encoding is pending:
+                    self._encoding = None
+            pending[1].set()
+        return version, data
@@ -0,0 +1,318 @@
+"""Simulate N dashboards polling the backend and report latency, throughput and detector FPS.
+
+Each simulated dashboard replays the frontend's polling timers:
+  VehicleDetection:       /api/detect/stats every 1s, /api/detect/frame every 100ms
+                          and every 1s for the seek bar (each aborts its previous
+                          request if still pending), /api/traffic/data every 2s
+  TrafficSignalControl:   /api/signal/status, /api/signal/decisions and
+                          /api/traffic/data concurrently every 2s (Promise.all)
+Like setInterval, timers fire on schedule whether or not earlier requests have
+finished. Every request uses its own connection, so an abort closes the socket
+the way a browser's AbortController does.
+
+Detector FPS comes from /metrics, sampled before the clients start (baseline)
+and while they run, so the cost of serving dashboards shows up as lost FPS.
+
+Usage:
+    python app.py --fake-detector --inference-ms 40 --no-debug &
+    python loadtest.py --start-source synthetic --clients 1,10,50 --duration 30
+    python loadtest.py --spawn-backend --inference-ms 40 --clients 25 --output run.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (name, paths, interval_s, abort_previous); all paths of a timer are requested concurrently
+DASHBOARD_TIMERS = [
+    ('stats', ('/api/detect/stats',), 1.0, False),
+    ('frame', ('/api/detect/frame',), 0.1, True),
+    ('position', ('/api/detect/frame',), 1.0, True),
+    ('traffic', ('/api/traffic/data',), 2.0, False),
+    ('signal', ('/api/signal/status', '/api/signal/decisions', '/api/traffic/data'), 2.0, False),
+]
+
+
+class LatencyRecorder:
+    """Thread-safe per-endpoint latency samples and error counts"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.aborted = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            if ok:
+                self.samples[endpoint].append(seconds)
+            else:
+                self.errors[endpoint] += 1
+
+    def abort(self, endpoint):
+        with self._lock:
+            self.aborted[endpoint] += 1
+
+    def summary(self, elapsed_s):
+        rows = {}
+        with self._lock:
+            endpoints = set(self.samples) | set(self.errors) | set(self.aborted)
+            for endpoint in sorted(endpoints):
+                latencies = np.asarray(self.samples[endpoint]) * 1000.0
+                rows[endpoint] = {
+                    'requests': int(len(latencies)),
+                    'errors': self.errors[endpoint],
+                    'aborted': self.aborted[endpoint],
+                    'rps': round(len(latencies) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+                    'p50_ms': round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+                    'p99_ms': round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+                    'max_ms': round(float(latencies.max()), 2) if len(latencies) else None,
+                }
+        return rows
+
+
+class DashboardRequest(threading.Thread):
+    """One GET on its own connection; abort() closes the socket like fetch's AbortController"""
+    def __init__(self, host, port, path, endpoint, recorder):
+        super().__init__(daemon=True)
+        self.path = path
+        self.endpoint = endpoint
+        self.recorder = recorder
+        self.aborted = False
+        self._conn = http.client.HTTPConnection(host, port, timeout=10)
+
+    def run(self):
+        started = time.perf_counter()
+        ok = False
+        try:
+            if not self.aborted:
+                self._conn.request('GET', self.path)
+                response = self._conn.getresponse()
+                response.read()
+                ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+        finally:
+            self._conn.close()
+        if self.aborted:
+            self.recorder.abort(self.endpoint)
+        else:
+            self.recorder.record(self.endpoint, time.perf_counter() - started, ok)
+
+    def abort(self):
+        self.aborted = True
+        sock = self._conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _timer(base_url, name, paths, interval_s, abort_previous, recorder, stop):
+    """Fire requests on a fixed schedule until stop is set, never waiting for earlier ones"""
+    url = urlsplit(base_url)
+    host, port, prefix = url.hostname, url.port or 80, url.path.rstrip('/')
+    next_tick = time.perf_counter() + np.random.uniform(0, interval_s)  # Desynchronize dashboards
+    pending = []
+
+    while not stop.is_set():
+        delay = next_tick - time.perf_counter()
+        if delay > 0 and stop.wait(delay):
+            break
+        next_tick += interval_s
+        pending = [request for request in pending if request.is_alive()]
+        if abort_previous:
+            for request in pending:
+                request.abort()
+        for path in paths:
+            endpoint = path + ' (position)' if name == 'position' else path
+            request = DashboardRequest(host, port, prefix + path, endpoint, recorder)
+            request.start()
+            pending.append(request)
+
+    # Let requests already sent finish so the stage accounts for them
+    for request in pending:
+        request.join(timeout=10)
+
+
+def run_dashboards(base_url, clients, duration_s, recorder):
+    """Run `clients` simulated dashboards for duration_s seconds"""
+    stop = threading.Event()
+    threads = []
+    for _ in range(clients):
+        for name, paths, interval_s, abort_previous in DASHBOARD_TIMERS:
+            thread = threading.Thread(
+                target=_timer, args=(base_url, name, paths, interval_s, abort_previous, recorder, stop),
+                daemon=True)
+            thread.start()
+            threads.append(thread)
+    time.sleep(duration_s)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=15)
+
+
+def scrape_fps(base_url):
+    """(effective fps gauge, frames processed counter) summed over streams from /metrics"""
+    text = requests.get(base_url + '/metrics', timeout=5).text
+    fps, frames = 0.0, 0.0
+    for line in text.splitlines():
+        if line.startswith('traffic_effective_fps{'):
+            fps += float(line.rsplit(' ', 1)[1])
+        elif line.startswith('traffic_frames_processed_total{'):
+            frames += float(line.rsplit(' ', 1)[1])
+    return fps, frames
+
+
+class FpsSampler(threading.Thread):
+    """Polls /metrics once a second during a stage"""
+    def __init__(self, base_url, interval_s=1.0):
+        super().__init__(daemon=True, name='fps-sampler')
+        self.base_url = base_url
+        self.interval_s = interval_s
+        self.samples = []
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(self.interval_s):
+            try:
+                self.samples.append(scrape_fps(self.base_url)[0])
+            except requests.RequestException:
+                pass
+
+
+def measure_detector_fps(base_url, duration_s, work=None):
+    """Detector FPS over a window: frames processed / elapsed, plus gauge min/mean"""
+    sampler = FpsSampler(base_url)
+    _, frames_before = scrape_fps(base_url)
+    started = time.perf_counter()
+    sampler.start()
+    if work is not None:
+        work()
+    else:
+        time.sleep(duration_s)
+    sampler.stop.set()
+    sampler.join()
+    elapsed = time.perf_counter() - started
+    _, frames_after = scrape_fps(base_url)
+    samples = sampler.samples or [0.0]
+    return {
+        'fps': round((frames_after - frames_before) / elapsed, 2) if elapsed > 0 else 0.0,
+        'fps_gauge_mean': round(float(np.mean(samples)), 2),
+        'fps_gauge_min': round(float(np.min(samples)), 2),
+    }, elapsed
+
+
+def run_stage(base_url, clients, duration_s):
+    recorder = LatencyRecorder()
+    detector, elapsed = measure_detector_fps(
+        base_url, duration_s, lambda: run_dashboards(base_url, clients, duration_s, recorder))
+    endpoints = recorder.summary(elapsed)
+    return {
+        'clients': clients,
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': round(sum(r['rps'] for r in endpoints.values()), 2),
+        'detector': detector,
+        'endpoints': endpoints,
+    }
+
+
+def wait_for_backend(base_url, timeout_s=60):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/api/health', timeout=2).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def print_stage(stage, baseline_fps):
+    print(f"\n== {stage['clients']} dashboards, {stage['duration_s']}s: "
+          f"{stage['throughput_rps']} req/s, detector {stage['detector']['fps']} fps "
+          f"(baseline {baseline_fps}, gauge min {stage['detector']['fps_gauge_min']})")
+    print(f"{'endpoint':<40}{'reqs':>8}{'err':>6}{'abort':>7}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in stage['endpoints'].items():
+        print(f"{endpoint:<40}{row['requests']:>8}{row['errors']:>6}{row['aborted']:>7}{row['rps']:>9}"
+              f"{str(row['p50_ms']):>10}{str(row['p99_ms']):>10}{str(row['max_ms']):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the backend with simulated dashboards')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', default='1,10,25',
+                        help='Comma-separated dashboard counts; each is run as its own stage')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per stage')
+    parser.add_argument('--baseline-duration', type=float, default=5.0,
+                        help='Seconds of detector FPS measured with no dashboards')
+    parser.add_argument('--start-source',
+                        help="POST /api/detect/start with this source first (e.g. 'synthetic')")
+    parser.add_argument('--spawn-backend', action='store_true',
+                        help="Start app.py with the fake detector on --url's port and source 'synthetic' "
+                             "(checkpoint restore and writes disabled so runs stay independent)")
+    parser.add_argument('--inference-ms', type=float, default=40.0,
+                        help='Simulated inference latency for --spawn-backend')
+    parser.add_argument('--output', help='Write the results JSON here')
+    args = parser.parse_args(argv)
+
+    base_url = args.url.rstrip('/')
+    backend = None
+    if args.spawn_backend:
+        port = base_url.rsplit(':', 1)[-1].split('/')[0]
+        backend = subprocess.Popen(
+            [sys.executable, 'app.py', '--fake-detector', '--inference-ms', str(args.inference_ms),
+             '--port', port, '--no-debug', '--no-restore', '--checkpoint-interval', '0'],
+            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        args.start_source = args.start_source or 'synthetic'
+
+    try:
+        if not wait_for_backend(base_url):
+            print(f'Backend at {base_url} did not become healthy', file=sys.stderr)
+            return 1
+        if args.start_source:
+            response = requests.post(base_url + '/api/detect/start', json={'source': args.start_source}, timeout=30)
+            if not response.ok and 'already running' not in response.text:
+                print(f'Could not start detection: {response.text}', file=sys.stderr)
+                return 1
+            time.sleep(2.0)  # Let the pipeline warm up
+
+        baseline, _ = measure_detector_fps(base_url, args.baseline_duration)
+        print(f"Baseline detector FPS (no dashboards): {baseline['fps']}")
+
+        stages = []
+        for clients in (int(c) for c in args.clients.split(',')):
+            stage = run_stage(base_url, clients, args.duration)
+            print_stage(stage, baseline['fps'])
+            stages.append(stage)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'url': base_url, 'baseline': baseline, 'stages': stages}, f, indent=2)
+        return 0
+    finally:
+        if backend is not None:
+            try:
+                requests.post(base_url + '/api/detect/stop', timeout=5)
+            except requests.RequestException:
+                pass
+            backend.terminate()
+            backend.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is requested while another one runs"""
+
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+class SamplingProfiler:
+    """Low-overhead wall-clock sampler built on sys._current_frames().
+
+    The calling thread snapshots the stacks of the selected threads every
+    `interval` seconds. Nothing is installed in the profiled threads, so the
+    cost to the detection loop is one GIL hand-off per sample.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, duration, interval=0.005, thread_ids=None, top=20):
+        """Sample for `duration` seconds and return collapsed stacks plus a top-N table.
+
+        thread_ids: idents of the threads to sample, or None for every thread
+        except the sampler itself.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy('A profiling session is already running')
+        try:
+            return self._sample(duration, interval, thread_ids, top)
+        finally:
+            self._lock.release()
+
+    def _sample(self, duration, interval, thread_ids, top):
+        own_ident = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = Counter()
+        self_counts = Counter()
+        total_counts = Counter()
+        sample_count = 0
+
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own_ident or (thread_ids is not None and ident not in thread_ids):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if not labels:
+                    continue
+                labels.reverse()
+                thread_name = names.get(ident, str(ident))
+                stacks[';'.join([thread_name] + labels)] += 1
+                self_counts[labels[-1]] += 1
+                # Count each function once per sample even if it recurses
+                for label in set(labels):
+                    total_counts[label] += 1
+            sample_count += 1
+            del frames
+            time.sleep(interval)
+
+        thread_samples = max(1, sum(self_counts.values()))
+        table = []
+        # Rank by self time first: cumulative samples are dominated by entry points
+        ranked = sorted(total_counts, key=lambda l: (self_counts.get(l, 0), total_counts[l]), reverse=True)
+        for label in ranked[:top]:
+            count = total_counts[label]
+            table.append({
+                'function': label,
+                'self_samples': self_counts.get(label, 0),
+                'total_samples': count,
+                'self_pct': round(100.0 * self_counts.get(label, 0) / thread_samples, 2),
+                'total_pct': round(100.0 * count / thread_samples, 2)
+            })
+        collapsed = '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common())
+        return {
+            'mode': 'sampling',
+            'duration_s': duration,
+            'interval_s': interval,
+            'samples': sample_count,
+            'collapsed': collapsed,
+            'top': table
+        }
+
+
+class FrameProfiler:
+    """Deterministic cProfile session covering the next N frames of a loop.
+
+    The loop calls frame_start()/frame_end() around each frame; profiling is
+    enabled and disabled on the loop's own thread because cProfile only
+    traces the thread that enabled it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames_requested = 0
+        self._frames_done = 0
+        self._cancelled = False
+        self._profile = None  # Only replaced/cleared on the loop thread
+        self._result = None
+        self._done = threading.Event()
+        self._started_at = None
+
+    def frame_start(self):
+        if self._frames_requested and self._profile is None and not self._done.is_set():
+            self._profile = cProfile.Profile()
+            self._started_at = time.perf_counter()
+            self._profile.enable()
+
+    def frame_end(self):
+        profile = self._profile
+        if profile is None:
+            return
+        self._frames_done += 1
+        if self._frames_done >= self._frames_requested or self._cancelled:
+            profile.disable()
+            self._result = (profile, self._frames_done, time.perf_counter() - self._started_at)
+            self._profile = None
+            self._frames_requested = 0
+            self._done.set()
+
+    def profile_frames(self, frames, timeout, top=20):
+        """Profile the next `frames` frames; blocks up to `timeout` seconds."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy('A profiling session is already running')
+        try:
+            if self._profile is not None:
+                # A cancelled session is still waiting for the loop to disable it
+                raise ProfilerBusy('Previous profiling session has not been released by the loop yet')
+            self._done.clear()
+            self._result = None
+            self._cancelled = False
+            self._frames_done = 0
+            self._frames_requested = frames
+            if not self._done.wait(timeout):
+                # Ask the loop to stop at its next frame boundary; cProfile can
+                # only be disabled from the thread that enabled it.
+                self._cancelled = True
+                self._frames_requested = 0
+                return {'mode': 'deterministic', 'completed': False, 'frames': self._frames_done}
+            profile, frames_done, elapsed = self._result
+            return self._report(profile, frames_done, elapsed, top)
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _report(profile, frames, elapsed, top):
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        rows = []
+        for (filename, lineno, funcname), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            rows.append({
+                'function': f'{os.path.basename(filename)}:{funcname}:{lineno}',
+                'calls': nc,
+                'primitive_calls': cc,
+                'tottime_s': round(tt, 6),
+                'cumtime_s': round(ct, 6),
+                'cumtime_per_frame_ms': round(1000.0 * ct / max(1, frames), 3)
+            })
+        rows.sort(key=lambda row: row['cumtime_s'], reverse=True)
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(top)
+        return {
+            'mode': 'deterministic',
+            'completed': True,
+            'frames': frames,
+            'elapsed_s': round(elapsed, 4),
+            'top': rows[:top],
+            'report': text.getvalue()
+        }
@@ -0,0 +1,237 @@
+import bisect
+import threading
+import time
+from collections import defaultdict, deque
+
+import cv2
+import numpy as np
+
+from tracker import VEHICLE_CATEGORIES
+
+
+HIST_BINS = (8, 4, 4)  # Hue, saturation, value
+EMBEDDING_DIM = int(np.prod(HIST_BINS))
+CROP_SIZE = (32, 32)
+
+
+def appearance_embedding(frame, bbox, margin=0.1):
+    """Unit-length HSV color histogram of a vehicle's box (cosine similarity = dot product)
+
+    The box is shrunk by `margin` on each side to cut background and
+    resized to a small fixed crop so cost doesn't depend on vehicle size.
+    """
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = bbox
+    dx, dy = int((x2 - x1) * margin), int((y2 - y1) * margin)
+    x1, y1 = max(0, x1 + dx), max(0, y1 + dy)
+    x2, y2 = min(width, x2 - dx), min(height, y2 - dy)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    crop = cv2.resize(frame[y1:y2, x1:x2], CROP_SIZE, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, list(HIST_BINS), [0, 180, 0, 256, 0, 256])
+    # Square root (Hellinger) damps dominant bins such as a uniform body color
+    embedding = np.sqrt(hist.reshape(-1))
+    norm = np.linalg.norm(embedding)
+    return (embedding / norm).astype(np.float32) if norm > 0 else None
+
+
+class ReIdIndex:
+    """Time-windowed approximate nearest-neighbor index of vehicle sightings, shared by all streams
+
+    Random-hyperplane LSH (cosine): each sighting is hashed into one bucket
+    per table, and a query only scores the union of its buckets. Storage is a
+    ring buffer in arrival order; sightings older than window_s are expired
+    from the front, and their bucket entries are trimmed lazily on lookup.
+
+    add() stores a sighting and matches it against earlier sightings from
+    other streams within [min_travel_s, max_travel_s]; each match is a
+    travel time from the upstream to the downstream camera.
+    """
+    def __init__(self, dim=EMBEDDING_DIM, window_s=1800.0, n_tables=8, n_bits=12,
+                 min_similarity=0.85, min_travel_s=1.0, max_travel_s=900.0, capacity=16384,
+                 max_matches=1000, seed=0):
+        self.dim = dim
+        self.window_s = window_s
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.min_similarity = min_similarity
+        self.min_travel_s = min_travel_s
+        self.max_travel_s = min(max_travel_s, window_s)
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_tables * n_bits, dim)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(n_bits, dtype=np.int64))
+        self._center = np.full(dim, 1.0 / np.sqrt(dim), dtype=np.float32)  # Until _recenter()
+        self._centered = False
+        self.center_after = 1024  # Sightings before the hashing center is estimated from data
+        self._lock = threading.Lock()
+        self._alloc(capacity)
+        self._matched_by = {}  # seq -> downstream stream ids that already matched it
+        self._buckets = [defaultdict(list) for _ in range(n_tables)]
+        self._head = 0   # Sequence number of the oldest live sighting
+        self._tail = 0   # Sequence number the next sighting gets
+        self._streams = []
+        self._stream_index = {}
+        self.matches = deque(maxlen=max_matches)
+        self.sightings = 0
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self._embeddings = np.empty((capacity, self.dim), dtype=np.float32)
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._stream_ids = np.empty(capacity, dtype=np.int32)
+        self._track_ids = np.empty(capacity, dtype=np.int64)
+        self._categories = np.empty(capacity, dtype=np.uint8)
+
+    def _grow(self):
+        """Double the ring buffer, keeping live sightings at their seq % capacity slots"""
+        old = (self._embeddings, self._timestamps, self._stream_ids, self._track_ids, self._categories)
+        old_capacity = self.capacity
+        self._alloc(old_capacity * 2)
+        seqs = np.arange(self._head, self._tail)
+        src, dst = seqs % old_capacity, seqs % self.capacity
+        for new, previous in zip((self._embeddings, self._timestamps, self._stream_ids, self._track_ids,
+                                  self._categories), old):
+            new[dst] = previous[src]
+
+    def _recenter(self):
+        """Center hashing on the mean of live embeddings and rebuild the buckets
+
+        Histograms are non-negative, so hyperplanes through the origin would
+        put most of them on the same side; centering spreads the buckets.
+        """
+        seqs = np.arange(self._head, self._tail)
+        slots = seqs % self.capacity
+        self._center = self._embeddings[slots].mean(axis=0)
+        self._buckets = [defaultdict(list) for _ in range(self.n_tables)]
+        codes = self._hash_many(self._embeddings[slots])
+        for seq, keys in zip(seqs.tolist(), codes.tolist()):
+            for table, key in zip(self._buckets, keys):
+                table[key].append(seq)
+        self._centered = True
+
+    def _hash(self, embedding):
+        bits = (self._planes @ (embedding - self._center) > 0).reshape(self.n_tables, self.n_bits)
+        return (bits @ self._bit_weights).tolist()
+
+    def _hash_many(self, embeddings):
+        bits = ((embeddings - self._center) @ self._planes.T > 0).reshape(-1, self.n_tables, self.n_bits)
+        return bits @ self._bit_weights
+
+    def _stream_id(self, stream):
+        idx = self._stream_index.get(stream)
+        if idx is None:
+            idx = len(self._streams)
+            self._streams.append(stream)
+            self._stream_index[stream] = idx
+        return idx
+
+    def _expire(self, now):
+        cutoff = now - self.window_s
+        while self._head < self._tail and self._timestamps[self._head % self.capacity] < cutoff:
+            self._matched_by.pop(self._head, None)
+            self._head += 1
+
+    def _candidates(self, keys):
+        """Live sequence numbers sharing at least one bucket with keys"""
+        seqs = set()
+        for table, key in zip(self._buckets, keys):
+            bucket = table.get(key)
+            if not bucket:
+                continue
+            if bucket[0] < self._head:
+                # Oldest entries expired; buckets are in arrival order so trim the front.
+                # Every insert looks up its own buckets first, so growing buckets stay trimmed.
+                del bucket[:bisect.bisect_left(bucket, self._head)]
+                if not bucket:
+                    del table[key]
+                    continue
+            seqs.update(bucket)
+        return seqs
+
+    def add(self, stream, track_id, vehicle_type, embedding, timestamp=None):
+        """Store a sighting; returns the best upstream match as a travel-time record, or None"""
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        category = VEHICLE_CATEGORIES.index(vehicle_type)
+        with self._lock:
+            if not self._centered and self._tail - self._head >= self.center_after:
+                self._recenter()
+            keys = self._hash(embedding)
+            self._expire(timestamp)
+            stream_id = self._stream_id(stream)
+            match = self._match(stream_id, category, embedding, timestamp, keys)
+
+            if self._tail - self._head >= self.capacity:
+                self._grow()
+            seq = self._tail
+            slot = seq % self.capacity
+            self._embeddings[slot] = embedding
+            self._timestamps[slot] = timestamp
+            self._stream_ids[slot] = stream_id
+            self._track_ids[slot] = track_id
+            self._categories[slot] = category
+            self._tail += 1
+            for table, key in zip(self._buckets, keys):
+                table[key].append(seq)
+            self.sightings += 1
+            if match is not None:
+                self.matches.append(match)
+            return match
+
+    def _match(self, stream_id, category, embedding, timestamp, keys):
+        seqs = self._candidates(keys)
+        if not seqs:
+            return None
+        seqs = np.fromiter(seqs, dtype=np.int64, count=len(seqs))
+        slots = seqs % self.capacity
+        travel = timestamp - self._timestamps[slots]
+        valid = ((self._stream_ids[slots] != stream_id) & (self._categories[slots] == category) &
+                 (travel >= self.min_travel_s) & (travel <= self.max_travel_s))
+        slots, seqs = slots[valid], seqs[valid]
+        if not len(slots):
+            return None
+        similarity = self._embeddings[slots] @ embedding
+        for i in np.argsort(-similarity).tolist():
+            if similarity[i] < self.min_similarity:
+                return None
+            slot, seq = int(slots[i]), int(seqs[i])
+            matched_by = self._matched_by.setdefault(seq, set())
+            if stream_id in matched_by:
+                continue  # That upstream vehicle was already matched at this camera
+            matched_by.add(stream_id)
+            return {
+                'from_stream': self._streams[self._stream_ids[slot]],
+                'to_stream': self._streams[stream_id],
+                'from_track': int(self._track_ids[slot]),
+                'type': VEHICLE_CATEGORIES[category],
+                'departed': float(self._timestamps[slot]),
+                'arrived': timestamp,
+                'travel_time_s': round(float(timestamp - self._timestamps[slot]), 2),
+                'similarity': round(float(similarity[i]), 3)
+            }
+        return None
+
+    def travel_times(self, since_s=None):
+        """Per (from_stream, to_stream) travel-time summary over recent matches"""
+        cutoff = time.time() - since_s if since_s else None
+        with self._lock:
+            matches = [m for m in self.matches if cutoff is None or m['arrived'] >= cutoff]
+            live = self._tail - self._head
+        pairs = defaultdict(list)
+        for m in matches:
+            pairs[(m['from_stream'], m['to_stream'])].append(m['travel_time_s'])
+        corridors = []
+        for (from_stream, to_stream), times in sorted(pairs.items()):
+            times = np.asarray(times)
+            corridors.append({
+                'from_stream': from_stream,
+                'to_stream': to_stream,
+                'matches': int(len(times)),
+                'median_s': round(float(np.median(times)), 2),
+                'p85_s': round(float(np.percentile(times, 85)), 2),
+                'min_s': round(float(times.min()), 2),
+                'max_s': round(float(times.max()), 2)
+            })
+        return {'corridors': corridors, 'indexed_sightings': live, 'total_sightings': self.sightings,
+                'window_s': self.window_s, 'recent_matches': matches[-20:]}
@@ -0,0 +1,206 @@
+"""Replay recorded detections through the tracker without running the model.
+
+Usage:
+    python replay.py recordings/run.tdl --max-distance 80 --output new.json --baseline old.json
+    python replay.py recordings/run.tdl --sweep max_distance=60,80,100 --sweep max_disappeared=15,30
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from detection_log import DetectionLog
+from tracker import VehicleTracker, TYPE_MAPPING
+
+
+DEFAULT_PARAMS = {
+    'counting_line': [(100, 300), (500, 300)],
+    'max_disappeared': 30,
+    'max_distance': 100,
+    'pixel_to_meter_ratio': 0.05,
+    'speed_limit_kmh': 60,
+}
+
+
+def params_from_header(header):
+    """Replay parameters recorded by the live run, falling back to DEFAULT_PARAMS"""
+    params = dict(DEFAULT_PARAMS)
+    for name in DEFAULT_PARAMS:
+        if header.get(name) is not None:
+            params[name] = header[name]
+    # JSON stores the line's points as lists
+    params['counting_line'] = [tuple(point) for point in params['counting_line']]
+    return params
+
+
+def summarize_crossings(crossings, speed_limit_kmh):
+    """Counts and speed statistics over a list of crossing events"""
+    counts_by_type = {'cars': 0, 'trucks': 0, 'buses': 0, 'bikes': 0}
+    speeds_by_type = defaultdict(list)
+    speeds = []
+    for crossing in crossings:
+        plural_type = TYPE_MAPPING.get(crossing['type'], 'cars')
+        counts_by_type[plural_type] += 1
+        if crossing['speed'] > 0:
+            speeds.append(crossing['speed'])
+            speeds_by_type[plural_type].append(crossing['speed'])
+
+    speed_stats = {
+        'average_speed': round(float(np.mean(speeds)), 2) if speeds else 0.0,
+        'max_speed': round(float(np.max(speeds)), 2) if speeds else 0.0,
+        'min_speed': round(float(np.min(speeds)), 2) if speeds else 0.0,
+        'speeding_count': sum(1 for s in speeds if s > speed_limit_kmh),
+        'speed_by_type': {
+            vtype: round(float(np.mean(speeds_by_type[vtype])), 2) if speeds_by_type[vtype] else 0.0
+            for vtype in counts_by_type
+        }
+    }
+    return {
+        'vehicle_count': len(crossings),
+        'counts_by_type': counts_by_type,
+        'speed_stats': speed_stats
+    }
+
+
+def replay(log, params=None):
+    """Feed a DetectionLog (or path) through a fresh VehicleTracker and return counts and speeds"""
+    if isinstance(log, str):
+        log = DetectionLog.load(log)
+    # Seed from what the live run used; caller overrides go on top
+    params = {**params_from_header(log.header), **(params or {})}
+    tracker = VehicleTracker(
+        counting_line=params['counting_line'],
+        max_disappeared=params['max_disappeared'],
+        max_distance=params['max_distance'],
+        pixel_to_meter_ratio=params['pixel_to_meter_ratio']
+    )
+
+    crossings = []
+    start = time.perf_counter()
+    for frame_idx, timestamp_s, detections in log.frames():
+        for crossing in tracker.update(detections, timestamp_s):
+            crossing['frame_idx'] = frame_idx
+            crossings.append(crossing)
+    elapsed = time.perf_counter() - start
+
+    result = summarize_crossings(crossings, params['speed_limit_kmh'])
+    result.update({
+        'params': params,
+        'frames': len(log),
+        'elapsed_s': round(elapsed, 4),
+        'replay_fps': round(len(log) / elapsed, 1) if elapsed > 0 else None,
+        'crossings': [
+            {'frame_idx': c['frame_idx'], 'timestamp': round(c['timestamp'], 4), 'track_id': c['track_id'],
+             'type': c['type'], 'speed': round(c['speed'], 2)}
+            for c in crossings
+        ]
+    })
+    return result
+
+
+_worker_log = None
+
+
+def _init_worker(path):
+    global _worker_log
+    _worker_log = DetectionLog.load(path)
+
+
+def _replay_in_worker(params):
+    return replay(_worker_log, params)
+
+
+def sweep(path, param_sets, processes=None):
+    """Replay the log once per parameter set in parallel worker processes"""
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(path,)) as pool:
+        return list(pool.map(_replay_in_worker, param_sets))
+
+
+def diff_results(baseline, candidate):
+    """Differences between two replay results (candidate - baseline)"""
+    delta_by_type = {
+        vtype: candidate['counts_by_type'].get(vtype, 0) - baseline['counts_by_type'].get(vtype, 0)
+        for vtype in baseline['counts_by_type']
+    }
+    speed_delta = {
+        key: round(candidate['speed_stats'][key] - baseline['speed_stats'][key], 2)
+        for key in ('average_speed', 'max_speed', 'min_speed', 'speeding_count')
+    }
+    baseline_frames = {(c['frame_idx'], c['type']) for c in baseline['crossings']}
+    candidate_frames = {(c['frame_idx'], c['type']) for c in candidate['crossings']}
+    return {
+        'vehicle_count': candidate['vehicle_count'] - baseline['vehicle_count'],
+        'counts_by_type': delta_by_type,
+        'speed_stats': speed_delta,
+        'crossings_only_in_baseline': sorted(baseline_frames - candidate_frames),
+        'crossings_only_in_candidate': sorted(candidate_frames - baseline_frames),
+        'identical': baseline_frames == candidate_frames and delta_by_type == {k: 0 for k in delta_by_type}
+    }
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded detections through the tracker')
+    parser.add_argument('log', help='Detection log recorded by detection_loop')
+    parser.add_argument('--counting-line', help='x1,y1,x2,y2')
+    parser.add_argument('--max-distance', type=float)
+    parser.add_argument('--max-disappeared', type=int)
+    parser.add_argument('--pixel-to-meter-ratio', type=float)
+    parser.add_argument('--speed-limit-kmh', type=float)
+    parser.add_argument('--sweep', action='append', default=[],
+                        help='name=v1,v2,... (repeatable; the cartesian product is replayed)')
+    parser.add_argument('--processes', type=int, help='Worker processes for --sweep')
+    parser.add_argument('--output', help='Write the result JSON here')
+    parser.add_argument('--baseline', help='Result JSON from a previous replay to diff against')
+    args = parser.parse_args(argv)
+
+    params = {}
+    if args.counting_line:
+        x1, y1, x2, y2 = (int(v) for v in args.counting_line.split(','))
+        params['counting_line'] = [(x1, y1), (x2, y2)]
+    for name in ('max_distance', 'max_disappeared', 'pixel_to_meter_ratio', 'speed_limit_kmh'):
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+
+    if args.sweep:
+        names, values = [], []
+        for spec in args.sweep:
+            name, _, options = spec.partition('=')
+            names.append(name.replace('-', '_'))
+            values.append([_parse_value(v) for v in options.split(',')])
+        param_sets = [{**params, **dict(zip(names, combo))} for combo in itertools.product(*values)]
+        results = sweep(args.log, param_sets, args.processes)
+        output = [{k: r[k] for k in ('params', 'vehicle_count', 'counts_by_type', 'speed_stats')} for r in results]
+        for row in output:
+            swept = {name: row['params'][name] for name in names}
+            print(f"{swept} -> count={row['vehicle_count']} avg_speed={row['speed_stats']['average_speed']}")
+    else:
+        output = replay(args.log, params)
+        print(f"{output['frames']} frames in {output['elapsed_s']}s ({output['replay_fps']} fps): "
+              f"count={output['vehicle_count']} {output['counts_by_type']} "
+              f"avg_speed={output['speed_stats']['average_speed']} km/h")
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            output['diff'] = diff_results(baseline, output)
+            print(json.dumps(output['diff'], indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
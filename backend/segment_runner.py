@@ -0,0 +1,203 @@
+"""Process a long video file as parallel time segments.
+
+Each worker process decodes and runs detection on one segment (plus an
+overlap window past its end) and writes a segment detection log. The logs
+are then merged frame by frame and replayed through a single VehicleTracker,
+so line-crossing counts and speeds match a sequential run.
+
+Usage:
+    python segment_runner.py traffic.mp4 --workers 16 --output result.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from detection_log import DetectionLog, DetectionLogWriter
+from detections import Detections
+from replay import DEFAULT_PARAMS, replay
+
+
+def plan_segments(total_frames, segments, overlap_frames):
+    """Split [0, total_frames) into contiguous segments
+
+    Returns [(start, end, decode_end)] where decode_end extends end by the
+    overlap window so the next segment's seek inaccuracy can be covered.
+    """
+    segments = max(1, min(segments, total_frames))
+    bounds = np.linspace(0, total_frames, segments + 1).astype(int)
+    return [
+        (int(start), int(end), int(min(total_frames, end + overlap_frames)))
+        for start, end in zip(bounds[:-1], bounds[1:]) if end > start
+    ]
+
+
+def _init_worker(threads_per_worker):
+    """Load the model once per worker process"""
+    import torch
+    import app as backend_app
+
+    torch.set_num_threads(threads_per_worker)
+    cv2.setNumThreads(1)
+    if not backend_app.load_model():
+        raise RuntimeError('Failed to load model in segment worker')
+
+
+def _detect_segment(task):
+    """Decode and detect one segment, writing its detections to a log file"""
+    import app as backend_app
+
+    source, start, end, decode_end, log_path = task
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f'Could not open video source: {source}')
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    writer = DetectionLogWriter(log_path, {'source': source, 'start': start, 'end': end})
+    first_frame = None
+    started = time.perf_counter()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Same frame index / timestamp convention as detection_loop
+            frame_idx = int(cap.get(cv2.CAP_PROP_POS_FRAMES) or 0)
+            if frame_idx > decode_end:
+                break
+            pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC) or 0
+            fps = float(cap.get(cv2.CAP_PROP_FPS) or 0)
+            timestamp_s = pos_msec / 1000.0 if pos_msec > 0 else (frame_idx / fps if fps > 0 else 0.0)
+            if first_frame is None:
+                first_frame = frame_idx
+
+            result = backend_app.process_frame(frame, stream='segment')
+            writer.write_frame(frame_idx, timestamp_s, result['detections'] if result else Detections.empty())
+    finally:
+        writer.close()
+        cap.release()
+
+    return {
+        'start': start,
+        'end': end,
+        'first_frame': first_frame,
+        'frames': writer.frames_written,
+        'elapsed_s': round(time.perf_counter() - started, 2),
+        'log': log_path
+    }
+
+
+def merge_segment_logs(segments, merged_path):
+    """Merge per-segment logs into one log ordered by frame index
+
+    Frame f is taken from the segment that owns it (start < f <= end, using
+    the 1-based POS_FRAMES convention) when available. If that segment's
+    seek landed late, the gap is filled from the previous segment's overlap
+    window (or any other segment that decoded it). Returns the number of
+    frames still missing after reconciliation.
+    """
+    logs = [DetectionLog.load(seg['log']) for seg in segments]
+    chosen = {}  # frame_idx -> (log, row)
+    for seg, log in zip(segments, logs):
+        for row, frame_idx in enumerate(log.frame_indices.tolist()):
+            if seg['start'] < frame_idx <= seg['end'] or frame_idx not in chosen:
+                chosen[frame_idx] = (log, row)
+
+    writer = DetectionLogWriter(merged_path, {'segments': len(segments)})
+    try:
+        for frame_idx in sorted(chosen):
+            log, row = chosen[frame_idx]
+            records = log.records[log.offsets[row]:log.offsets[row + 1]]
+            writer.write_records(frame_idx, float(log.timestamps[row]), records)
+    finally:
+        writer.close()
+
+    if not chosen:
+        return 0
+    return (max(chosen) - min(chosen) + 1) - len(chosen)
+
+
+def run_segmented(source, workers=None, segments=None, overlap_frames=150, params=None,
+                  merged_log_path=None):
+    """Detect a video file in parallel segments and replay the merged detections"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f'Could not open video source: {source}')
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    if total_frames <= 0:
+        raise RuntimeError('Segmented processing needs a file source with a known frame count')
+
+    workers = workers or os.cpu_count() or 1
+    segments = segments or workers
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    plan = plan_segments(total_frames, segments, overlap_frames)
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='segments-') as tmpdir:
+        tasks = [
+            (source, start, end, decode_end, os.path.join(tmpdir, f'segment-{i:04d}.tdl'))
+            for i, (start, end, decode_end) in enumerate(plan)
+        ]
+        # spawn: never fork a process that already holds torch/OpenCV threads
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+            segment_results = pool.map(_detect_segment, tasks, chunksize=1)
+        detect_elapsed = time.perf_counter() - started
+
+        merged_path = merged_log_path or os.path.join(tmpdir, 'merged.tdl')
+        missing = merge_segment_logs(segment_results, merged_path)
+        result = replay(merged_path, params)
+
+    result.update({
+        'source': source,
+        'total_frames': total_frames,
+        'workers': workers,
+        'segments': [{k: v for k, v in seg.items() if k != 'log'} for seg in segment_results],
+        'missing_frames': missing,
+        'detect_elapsed_s': round(detect_elapsed, 2),
+        'total_elapsed_s': round(time.perf_counter() - started, 2),
+        'merged_log': merged_log_path
+    })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel segmented detection of a video file')
+    parser.add_argument('source', help='Video file path')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--segments', type=int, help='Number of segments (default: workers)')
+    parser.add_argument('--overlap-frames', type=int, default=150,
+                        help='Frames decoded past each segment end to cover inaccurate seeks')
+    parser.add_argument('--counting-line', help='x1,y1,x2,y2')
+    parser.add_argument('--pixel-to-meter-ratio', type=float)
+    parser.add_argument('--save-log', help='Keep the merged detection log at this path')
+    parser.add_argument('--output', help='Write the result JSON here')
+    args = parser.parse_args(argv)
+
+    params = dict(DEFAULT_PARAMS)
+    if args.counting_line:
+        x1, y1, x2, y2 = (int(v) for v in args.counting_line.split(','))
+        params['counting_line'] = [(x1, y1), (x2, y2)]
+    if args.pixel_to_meter_ratio is not None:
+        params['pixel_to_meter_ratio'] = args.pixel_to_meter_ratio
+
+    result = run_segmented(args.source, args.workers, args.segments, args.overlap_frames, params, args.save_log)
+    print(f"{result['total_frames']} frames with {result['workers']} workers: "
+          f"detect {result['detect_elapsed_s']}s, total {result['total_elapsed_s']}s, "
+          f"count={result['vehicle_count']} {result['counts_by_type']}, missing frames={result['missing_frames']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Synthetic video source and fake detector for load testing without a camera or model.
+
+SyntheticCapture implements the subset of the cv2.VideoCapture API the
+backend uses and renders vehicles driving down four lanes across the
+default counting line. FakeDetector mimics the YOLOv5 hub model interface
+(callable returning an object with .pred and .names) by segmenting those
+vehicles, with an optional artificial inference delay.
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+# COCO class ids the backend maps to vehicle categories
+COCO_NAMES = {2: 'car', 3: 'motorcycle', 5: 'bus', 7: 'truck'}
+# Vehicle class -> (box width, box height, red channel value used to recover the class)
+VEHICLE_SHAPES = {2: (60, 90, 200), 3: (30, 50, 160), 5: (80, 160, 120), 7: (80, 130, 240)}
+LANES_X = (100, 200, 300, 400)  # Lane left edges; centers lie inside the default counting line
+MIN_SPEED_PX = 4
+
+
+class SyntheticCapture:
+    """Deterministic endless traffic scene; frame f depends only on f"""
+    def __init__(self, width=1280, height=720, fps=30.0, spawn_interval=12):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.spawn_interval = spawn_interval  # Frames between vehicle spawns
+        self.position = 0  # Index of the next frame read() returns
+        self._opened = True
+        self._background = np.full((height, width, 3), 60, dtype=np.uint8)
+        for x in LANES_X:
+            cv2.line(self._background, (x, 0), (x, height), (90, 90, 90), 2)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Parse 'synthetic' or 'synthetic:WIDTHxHEIGHT@FPS'"""
+        _, _, params = spec.partition(':')
+        if not params:
+            return cls()
+        size, _, fps = params.partition('@')
+        width, _, height = size.partition('x')
+        return cls(int(width), int(height), float(fps or 30.0))
+
+    def _vehicles(self, frame_idx):
+        """(class_id, x1, y1, x2, y2) of vehicles visible in a frame"""
+        max_age = (self.height + 200) // MIN_SPEED_PX
+        first = max(0, (frame_idx - max_age) // self.spawn_interval)
+        last = frame_idx // self.spawn_interval
+        vehicles = []
+        for i in range(first, last + 1):
+            class_id = (2, 2, 7, 2, 3, 5)[i % 6]
+            width, height, _ = VEHICLE_SHAPES[class_id]
+            speed = MIN_SPEED_PX + 2 * (i % len(LANES_X))  # Constant per lane so vehicles never merge
+            y2 = speed * (frame_idx - i * self.spawn_interval)
+            y1 = y2 - height
+            if y2 <= 0 or y1 >= self.height:
+                continue
+            x1 = LANES_X[i % len(LANES_X)] + (50 - width // 2)
+            vehicles.append((class_id, x1, max(0, y1), x1 + width, min(self.height - 1, y2)))
+        return vehicles
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+    def grab(self):
+        if not self._opened:
+            return False
+        self.position += 1
+        return True
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        if image is None or image.shape != self._background.shape:
+            image = self._background.copy()
+        else:
+            np.copyto(image, self._background)
+        for class_id, x1, y1, x2, y2 in self._vehicles(self.position):
+            red = VEHICLE_SHAPES[class_id][2]
+            cv2.rectangle(image, (x1, y1), (x2, y2), (30, 30, red), -1)
+        self.position += 1
+        return True, image
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(0, self.position - 1) * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return 0.0  # FRAME_COUNT etc.: behaves like a live stream
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = max(0, int(value))
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self.position = max(0, int(round(value * self.fps / 1000.0)))
+            return True
+        return False
+
+
+class _FakeResults:
+    def __init__(self, pred):
+        self.pred = [pred]
+
+
+class FakeDetector:
+    """Drop-in for the YOLOv5 hub model: finds SyntheticCapture vehicles by color"""
+    def __init__(self, inference_ms=0.0):
+        self.inference_ms = inference_ms  # Simulated model latency at 640 px input
+        self.names = {i: 'object' for i in range(80)}
+        self.names.update(COCO_NAMES)
+        self.conf = 0.5
+        self.iou = 0.45
+        self._class_by_red = {shape[2]: class_id for class_id, shape in VEHICLE_SHAPES.items()}
+
+    def __call__(self, frame, size=640):
+        started = time.perf_counter()
+        mask = (frame[:, :, 2] >= 100) & (frame[:, :, 0] < 50)
+        contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rows = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            red = int(frame[y + h // 2, x + w // 2, 2])
+            class_id = self._class_by_red.get(red)
+            if class_id is None:
+                continue
+            rows.append((x, y, x + w - 1, y + h - 1, 0.9, class_id))
+        pred = np.asarray(rows, dtype=np.float32).reshape(-1, 6)
+        # Like a real detector, cost scales with the input area
+        remaining = self.inference_ms * (size / 640.0) ** 2 / 1000.0 - (time.perf_counter() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+        return _FakeResults(pred)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from forecast import AVERAGE_SPEED, VEHICLE_COUNT, VOLUME, SeasonalForecaster
+
+
+PATTERN = [10.0, 20.0, 30.0, 40.0]  # One season of 4 bins
+
+
+def train(forecaster, idx, bins):
+    """Feed the seasonal pattern bin by bin; returns the number of the last closed bin"""
+    forecaster.roll(0)
+    for bin_number in range(bins):
+        value = PATTERN[bin_number % len(PATTERN)]
+        for series in (VOLUME, VEHICLE_COUNT, AVERAGE_SPEED):
+            forecaster.observe(idx, series, value)
+        forecaster.roll(bin_number + 1)  # Closes bin_number
+    return bins - 1
+
+
+def test_forecast_is_anchored_to_last_closed_bin():
+    forecaster = SeasonalForecaster(bin_seconds=1, season_bins=len(PATTERN), beta=0.0, gamma=0.5)
+    idx = forecaster.index_of('test')
+    last_closed = train(forecaster, idx, 400 * len(PATTERN) + 1)
+
+    horizons = [1, 2, 3, 4, 5]
+    values, ready = forecaster.forecast(horizons)
+    assert ready[idx]
+    expected = [PATTERN[(last_closed + h) % len(PATTERN)] for h in horizons]
+    np.testing.assert_allclose(values[idx, :, VOLUME], expected, atol=0.5)
+    np.testing.assert_allclose(values[idx, :, AVERAGE_SPEED], expected, atol=0.5)
+
+
+def test_forecast_anchor_survives_checkpoint():
+    forecaster = SeasonalForecaster(bin_seconds=1, season_bins=len(PATTERN), beta=0.0, gamma=0.5)
+    train(forecaster, forecaster.index_of('test'), 200 * len(PATTERN) + 2)
+    restored = SeasonalForecaster(bin_seconds=1, season_bins=len(PATTERN), beta=0.0, gamma=0.5)
+    assert restored.set_state(*forecaster.get_state())
+    np.testing.assert_array_equal(restored.forecast([1, 3])[0], forecaster.forecast([1, 3])[0])
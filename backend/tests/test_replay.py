@@ -0,0 +1,58 @@
+from detection_log import DetectionLogWriter
+from detections import Detections, build_category_lut
+from replay import DEFAULT_PARAMS, replay
+from synthetic import FakeDetector, SyntheticCapture
+from tracker import VehicleTracker
+
+
+LIVE_LINE = [(100, 300), (380, 300)]  # Covers three of the four synthetic lanes
+LIVE_RATIO = 0.08
+
+
+def record_live_run(path, frames=600):
+    """Track a synthetic scene the way detection_loop does while recording it; returns the crossings"""
+    capture = SyntheticCapture(640, 480, fps=30.0)
+    detector = FakeDetector(inference_ms=0)
+    lut = build_category_lut(detector.names)
+    tracker = VehicleTracker(counting_line=LIVE_LINE, max_disappeared=30, max_distance=100,
+                             pixel_to_meter_ratio=LIVE_RATIO)
+    writer = DetectionLogWriter(str(path), {
+        'counting_line': tracker.counting_line,
+        'pixel_to_meter_ratio': tracker.pixel_to_meter_ratio,
+        'max_disappeared': tracker.max_disappeared,
+        'max_distance': tracker.max_distance,
+        'speed_limit_kmh': 60,
+    })
+    crossings = []
+    for frame_idx in range(1, frames + 1):
+        _, frame = capture.read()
+        detections = Detections.from_prediction(detector(frame).pred[0], lut)
+        timestamp_s = frame_idx / capture.fps
+        writer.write_frame(frame_idx, timestamp_s, detections)
+        crossings.extend(tracker.update(detections, timestamp_s))
+    writer.close()
+    return crossings
+
+
+def test_replay_matches_live_counts(tmp_path):
+    path = tmp_path / 'run.tdl'
+    live = record_live_run(path)
+    assert live
+
+    result = replay(str(path))
+    assert result['params']['counting_line'] == LIVE_LINE
+    assert result['params']['pixel_to_meter_ratio'] == LIVE_RATIO
+    assert result['vehicle_count'] == len(live)
+    assert [(c['track_id'], c['type']) for c in result['crossings']] == \
+        [(c['track_id'], c['type']) for c in live]
+    assert [c['speed'] for c in result['crossings']] == [round(c['speed'], 2) for c in live]
+
+
+def test_replay_overrides_header(tmp_path):
+    path = tmp_path / 'run.tdl'
+    live = record_live_run(path)
+
+    result = replay(str(path), {'counting_line': DEFAULT_PARAMS['counting_line']})
+    assert result['params']['counting_line'] == DEFAULT_PARAMS['counting_line']
+    assert result['params']['pixel_to_meter_ratio'] == LIVE_RATIO
+    assert result['vehicle_count'] > len(live)  # The default line also spans the fourth lane
@@ -0,0 +1,351 @@
+import math
+import time
+
+import numpy as np
+from scipy.spatial import distance
+
+
+VEHICLE_CATEGORIES = ('car', 'truck', 'bus', 'bike')
+# Map singular vehicle type to plural key for consistency with the stats payload
+TYPE_MAPPING = {'car': 'cars', 'truck': 'trucks', 'bus': 'buses', 'bike': 'bikes'}
+POSITION_HISTORY_LEN = 10  # Positions kept per track for speed estimation
+SPEED_HISTORY_LEN = 5  # Speeds averaged per track
+# Fixed-size record of one track, used for checkpoints
+TRACK_DTYPE = np.dtype([
+    ('track_id', '<i8'),
+    ('last_position', '<i4', (2,)),
+    ('bbox', '<i4', (4,)),
+    ('counted', '?'),
+    ('category', 'u1'),
+    ('disappeared', '<i4'),
+    ('last_seen', '<f8'),
+    ('speed', '<f8'),
+    ('position_count', 'u1'),
+    ('position_history', '<f8', (POSITION_HISTORY_LEN, 3)),
+    ('speed_count', 'u1'),
+    ('speed_history', '<f8', (SPEED_HISTORY_LEN,)),
+])
+
+
+def get_centroid(bbox):
+    """Calculate centroid of bounding box"""
+    x1, y1, x2, y2 = bbox
+    return ((x1 + x2) // 2, (y1 + y2) // 2)
+
+def calculate_speed_pixels_per_second(prev_pos, curr_pos, time_elapsed):
+    """Calculate speed in pixels per second"""
+    if time_elapsed <= 0:
+        return 0.0
+
+    pixel_distance = math.hypot(curr_pos[0] - prev_pos[0], curr_pos[1] - prev_pos[1])
+    return pixel_distance / time_elapsed
+
+def pixels_to_meters_per_second(pixels_per_second, pixel_to_meter_ratio):
+    """Convert pixels per second to meters per second"""
+    return pixels_per_second * pixel_to_meter_ratio
+
+def meters_per_second_to_kmh(mps):
+    """Convert meters per second to km/h"""
+    return mps * 3.6
+
+def orientation(p, q, r):
+    """Find orientation of ordered triplet (p, q, r)"""
+    val = (q[1] - p[1]) * (r[0] - q[0]) - (q[0] - p[0]) * (r[1] - q[1])
+    if val == 0:
+        return 0  # Collinear
+    return 1 if val > 0 else 2  # Clockwise or Counterclockwise
+
+def is_crossing_line(point, line_start, line_end, prev_point=None):
+    """Check if a point crosses a line"""
+    if prev_point is None:
+        return False
+
+    o1 = orientation(line_start, line_end, prev_point)
+    o2 = orientation(line_start, line_end, point)
+    o3 = orientation(prev_point, point, line_start)
+    o4 = orientation(prev_point, point, line_end)
+
+    # General case: line segments intersect
+    if o1 != o2 and o3 != o4:
+        return True
+
+    return False
+
+def crossing_mask(prev_points, points, line_start, line_end):
+    """(N,) bool: segment prev_points[i] -> points[i] crosses the line (same rule as is_crossing_line)"""
+    prev_points = np.asarray(prev_points, dtype=np.int64).reshape(-1, 2)
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    (sx, sy), (ex, ey) = line_start, line_end
+    px, py = prev_points[:, 0], prev_points[:, 1]
+    cx, cy = points[:, 0], points[:, 1]
+    # Orientation signs as in orientation(): line vs. both endpoints, motion vs. both line ends
+    o1 = np.sign((ey - sy) * (px - ex) - (ex - sx) * (py - ey))
+    o2 = np.sign((ey - sy) * (cx - ex) - (ex - sx) * (cy - ey))
+    o3 = np.sign((cy - py) * (sx - cx) - (cx - px) * (sy - cy))
+    o4 = np.sign((cy - py) * (ex - cx) - (cx - px) * (ey - cy))
+    return (o1 != o2) & (o3 != o4)
+
+
+class VehicleTracker:
+    """Centroid tracker with line-crossing counting and speed estimation
+
+    Holds all per-stream tracking state so the live loop, replays and
+    parameter sweeps can each run their own independent instance.
+    """
+    def __init__(self, counting_line=((100, 300), (500, 300)), max_disappeared=30,
+                 max_distance=100, pixel_to_meter_ratio=0.05):
+        self.counting_line = [tuple(counting_line[0]), tuple(counting_line[1])]
+        self.max_disappeared = max_disappeared  # Frames before removing a track
+        self.max_distance = max_distance  # Max distance for centroid matching
+        self.pixel_to_meter_ratio = pixel_to_meter_ratio  # 1 pixel = N meters (can be calibrated)
+        # {track_id: {'last_position': (x, y), 'bbox': [x1, y1, x2, y2], 'counted': False, 'type': str, 'last_seen': time, 'speed': float, 'position_history': [(x, y, time)], 'speed_history': [speed]}}
+        self.tracks = {}
+        self.next_track_id = 0
+        self.assigned_ids = np.empty(0, dtype=np.int64)  # Track id per detection of the last update
+
+    def reset(self):
+        """Drop all tracks (track ids keep increasing)"""
+        self.tracks.clear()
+
+    def to_array(self):
+        """All tracks as a TRACK_DTYPE array"""
+        records = np.zeros(len(self.tracks), dtype=TRACK_DTYPE)
+        for record, (track_id, track) in zip(records, list(self.tracks.items())):
+            positions = track.get('position_history', [])[-POSITION_HISTORY_LEN:]
+            speeds = track.get('speed_history', [])[-SPEED_HISTORY_LEN:]
+            record['track_id'] = track_id
+            record['last_position'] = track['last_position']
+            record['bbox'] = track.get('bbox', (0, 0, 0, 0))
+            record['counted'] = track['counted']
+            record['category'] = VEHICLE_CATEGORIES.index(track['type'])
+            record['disappeared'] = track.get('disappeared', 0)
+            record['last_seen'] = track['last_seen']
+            record['speed'] = track.get('speed', 0.0)
+            record['position_count'] = len(positions)
+            record['position_history'][:len(positions)] = positions
+            record['speed_count'] = len(speeds)
+            record['speed_history'][:len(speeds)] = speeds
+        return records
+
+    def load_array(self, records, next_track_id):
+        """Replace all tracks with those in a TRACK_DTYPE array (see to_array)
+
+        Fields are converted column by column to the plain Python types update()
+        stores, so restored tracks are indistinguishable from live ones.
+        """
+        tracks = {}
+        columns = zip(records['track_id'].tolist(), records['last_position'].tolist(),
+                      records['bbox'].tolist(), records['counted'].tolist(), records['category'].tolist(),
+                      records['disappeared'].tolist(), records['last_seen'].tolist(),
+                      records['speed'].tolist(), records['position_count'].tolist(),
+                      records['position_history'].tolist(), records['speed_count'].tolist(),
+                      records['speed_history'].tolist())
+        for (track_id, last_position, bbox, counted, category, disappeared, last_seen, speed,
+             position_count, position_history, speed_count, speed_history) in columns:
+            tracks[track_id] = {
+                'last_position': tuple(last_position),
+                'bbox': bbox,
+                'counted': counted,
+                'type': VEHICLE_CATEGORIES[category],
+                'disappeared': disappeared,
+                'last_seen': last_seen,
+                'speed': speed,
+                'position_history': [(int(x), int(y), t) for x, y, t in position_history[:position_count]],
+                'speed_history': speed_history[:speed_count]
+            }
+        self.tracks.clear()
+        self.tracks.update(tracks)
+        self.next_track_id = max([next_track_id] + [track_id + 1 for track_id in tracks])
+
+    def calculate_vehicle_speed(self, track_id, current_position, current_time):
+        """Calculate vehicle speed from tracking history"""
+        if track_id not in self.tracks:
+            return 0.0
+
+        track = self.tracks[track_id]
+
+        # Initialize position history if not exists
+        if 'position_history' not in track:
+            track['position_history'] = []
+
+        # Add current position to history
+        track['position_history'].append((current_position[0], current_position[1], current_time))
+
+        # Keep only last 10 positions (for smoothing)
+        if len(track['position_history']) > POSITION_HISTORY_LEN:
+            track['position_history'] = track['position_history'][-POSITION_HISTORY_LEN:]
+
+        # Need at least 2 positions to calculate speed
+        if len(track['position_history']) < 2:
+            return 0.0
+
+        # Use last 2 positions for immediate speed
+        positions = track['position_history']
+        prev_pos = positions[-2]
+        curr_pos = positions[-1]
+
+        time_elapsed = curr_pos[2] - prev_pos[2]
+
+        if time_elapsed <= 0:
+            return 0.0
+
+        # Calculate pixel distance
+        pixel_speed = calculate_speed_pixels_per_second(
+            (prev_pos[0], prev_pos[1]),
+            (curr_pos[0], curr_pos[1]),
+            time_elapsed
+        )
+
+        # Convert to real-world speed
+        mps = pixels_to_meters_per_second(pixel_speed, self.pixel_to_meter_ratio)
+        kmh = meters_per_second_to_kmh(mps)
+
+        # Store speed history for smoothing
+        if 'speed_history' not in track:
+            track['speed_history'] = []
+
+        track['speed_history'].append(kmh)
+        if len(track['speed_history']) > SPEED_HISTORY_LEN:
+            track['speed_history'] = track['speed_history'][-SPEED_HISTORY_LEN:]
+
+        # Return average speed (smoothed)
+        if len(track['speed_history']) > 1:
+            avg_speed = sum(track['speed_history']) / len(track['speed_history'])
+            track['speed'] = avg_speed
+            return avg_speed
+
+        track['speed'] = kmh
+        return kmh
+
+    def _new_track(self, centroid, bbox, vehicle_type, current_time):
+        self.tracks[self.next_track_id] = {
+            'last_position': centroid,
+            'bbox': bbox,
+            'counted': False,
+            'type': vehicle_type,
+            'disappeared': 0,
+            'last_seen': current_time,
+            'speed': 0.0,
+            'position_history': [(centroid[0], centroid[1], current_time)],
+            'speed_history': []
+        }
+        self.next_track_id += 1
+        return self.next_track_id - 1
+
+    def update(self, detections, timestamp_s=None):
+        """Update tracks from one frame of detections (a Detections instance)
+
+        timestamp_s: seconds in video timebase (preferred). If None, wall-clock will be used.
+        Returns a list of crossing events:
+        [{'track_id', 'type', 'timestamp', 'speed', 'bbox'}] for tracks that crossed the counting line.
+        Afterwards self.assigned_ids[i] is the track id of detection i.
+        """
+        tracked_vehicles = self.tracks
+        crossings = []
+        self.assigned_ids = np.full(len(detections), -1, dtype=np.int64)
+
+        if not len(detections):
+            # Increment disappeared count for all tracks
+            for track_id in list(tracked_vehicles.keys()):
+                tracked_vehicles[track_id]['disappeared'] = tracked_vehicles[track_id].get('disappeared', 0) + 1
+                if tracked_vehicles[track_id]['disappeared'] > self.max_disappeared:
+                    del tracked_vehicles[track_id]
+            return crossings
+
+        # Current centroids from detections; Python values only for what tracks store
+        current_centroids = detections.centroids
+        centroid_list = [tuple(c) for c in current_centroids.tolist()]
+        bbox_list = detections.boxes.tolist()
+        categories = detections.categories.tolist()
+
+        # If no timestamp provided, fall back to wall-clock
+        if timestamp_s is None:
+            timestamp_s = time.time()
+        current_time = timestamp_s
+
+        # If no existing tracks, create new ones
+        if len(tracked_vehicles) == 0:
+            for col in range(len(detections)):
+                self.assigned_ids[col] = self._new_track(
+                    centroid_list[col], bbox_list[col], VEHICLE_CATEGORIES[categories[col]], current_time)
+            return crossings
+
+        # Match existing tracks with new detections
+        track_ids = list(tracked_vehicles.keys())
+        track_centroids = np.array([tracked_vehicles[tid]['last_position'] for tid in track_ids])
+
+        # Calculate distance matrix
+        D = distance.cdist(track_centroids, current_centroids)
+
+        # Find minimum values
+        rows = D.min(axis=1).argsort()
+        cols = D.argmin(axis=1)[rows]
+
+        # Greedy assignment in order of increasing distance
+        used_track_ids = set()
+        used_detection_indices = set()
+        matches = []
+        for (row, col) in zip(rows.tolist(), cols.tolist()):
+            if row in used_track_ids or col in used_detection_indices:
+                continue
+            if D[row, col] > self.max_distance:
+                continue
+            matches.append((row, col))
+            used_track_ids.add(row)
+            used_detection_indices.add(col)
+
+        # Line crossings for all matched pairs at once
+        if matches:
+            match_rows, match_cols = np.array(matches).T
+            crossed = crossing_mask(track_centroids[match_rows], current_centroids[match_cols],
+                                    *self.counting_line).tolist()
+        else:
+            crossed = []
+
+        # Update existing tracks
+        for (row, col), line_crossed in zip(matches, crossed):
+            track_id = track_ids[row]
+            track = tracked_vehicles[track_id]
+            current_position = centroid_list[col]
+            vehicle_type = VEHICLE_CATEGORIES[categories[col]]
+
+            crossed_now = line_crossed and not track['counted']
+            if crossed_now:
+                track['counted'] = True
+
+            # Calculate speed using provided timestamp (video timebase)
+            speed_kmh = self.calculate_vehicle_speed(track_id, current_position, current_time)
+
+            # Update track
+            track['last_position'] = current_position
+            track['bbox'] = bbox_list[col]
+            track['type'] = vehicle_type
+            track['disappeared'] = 0
+            track['last_seen'] = current_time
+            track['speed'] = speed_kmh
+            self.assigned_ids[col] = track_id
+
+            if crossed_now:
+                crossings.append({
+                    'track_id': track_id,
+                    'type': vehicle_type,
+                    'timestamp': current_time,
+                    'speed': float(speed_kmh),
+                    'bbox': bbox_list[col]
+                })
+
+        # Handle unmatched tracks (increment disappeared)
+        for row in range(len(track_ids)):
+            if row not in used_track_ids:
+                track_id = track_ids[row]
+                tracked_vehicles[track_id]['disappeared'] += 1
+                if tracked_vehicles[track_id]['disappeared'] > self.max_disappeared:
+                    del tracked_vehicles[track_id]
+
+        # Create new tracks for unmatched detections
+        for col in range(len(detections)):
+            if col not in used_detection_indices:
+                self.assigned_ids[col] = self._new_track(
+                    centroid_list[col], bbox_list[col], VEHICLE_CATEGORIES[categories[col]], current_time)
+
+        return crossings
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+INDEX_VERSION = 1
+
+
+def _cache_key(path):
+    """Stable key for a file: changes whenever the file is replaced or modified"""
+    stat = os.stat(path)
+    raw = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{INDEX_VERSION}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class VideoIndex:
+    """Per-file table of frame presentation times and keyframe positions
+
+    Frame i (0-based) is the i-th frame returned by read() from the start of
+    the file. Keyframes let seeks jump to an exact, decodable position and
+    grab() forward to the target instead of trusting the container's
+    timestamp-to-frame estimate.
+    """
+    def __init__(self, pts_ms, keyframes, fps):
+        self.pts_ms = np.asarray(pts_ms, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)  # Sorted frame indices
+        self.fps = float(fps)
+
+    @property
+    def frame_count(self):
+        return len(self.pts_ms)
+
+    @property
+    def duration_s(self):
+        if not len(self.pts_ms):
+            return 0.0
+        frame_s = 1.0 / self.fps if self.fps > 0 else 0.0
+        return float(self.pts_ms[-1]) / 1000.0 + frame_s
+
+    def keyframe_at_or_before(self, frame_idx):
+        if not len(self.keyframes):
+            return None
+        i = np.searchsorted(self.keyframes, frame_idx, side='right') - 1
+        return int(self.keyframes[max(0, i)])
+
+    def frame_for_pts(self, pos_msec):
+        """Frame index whose presentation time is closest to pos_msec"""
+        i = int(np.searchsorted(self.pts_ms, pos_msec))
+        if i <= 0:
+            return 0
+        if i >= len(self.pts_ms):
+            return len(self.pts_ms) - 1
+        return i if self.pts_ms[i] - pos_msec < pos_msec - self.pts_ms[i - 1] else i - 1
+
+    def seek(self, cap, target):
+        """Position cap so the next read() returns frame `target`. Returns True on success."""
+        target = int(min(max(0, target), self.frame_count - 1))
+        keyframe = self.keyframe_at_or_before(target)
+        if keyframe is None:
+            return bool(cap.set(cv2.CAP_PROP_POS_FRAMES, target))
+        if keyframe == 0:
+            ok = cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        else:
+            # Seeking to a keyframe's own timestamp lands exactly on it
+            ok = cap.set(cv2.CAP_PROP_POS_MSEC, float(self.pts_ms[keyframe]))
+        if not ok:
+            return False
+        # Decode forward without color conversion; grab() is much cheaper than read()
+        for _ in range(target - keyframe):
+            if not cap.grab():
+                return False
+        return True
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, pts_ms=self.pts_ms, keyframes=self.keyframes, fps=np.float64(self.fps))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['pts_ms'], data['keyframes'], float(data['fps']))
+
+    @classmethod
+    def build(cls, path):
+        """Scan the file once; uses raw (undecoded) packet reads when OpenCV supports it"""
+        raw_supported = hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME')
+        if raw_supported:
+            cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+            raw_supported = cap.isOpened()
+        if not raw_supported:
+            cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise RuntimeError(f'Could not open video source: {path}')
+
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0)
+        pts_ms, is_key = [], []
+        try:
+            while cap.grab():
+                pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if pos_msec is None or pos_msec < 0:
+                    count = len(pts_ms)
+                    pos_msec = count * 1000.0 / fps if fps > 0 else float(count)
+                pts_ms.append(float(pos_msec))
+                is_key.append(bool(raw_supported and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME)))
+        finally:
+            cap.release()
+
+        # Raw packets arrive in decode order; sort into presentation order so
+        # frame indices match what read() returns
+        order = np.argsort(np.asarray(pts_ms, dtype=np.float64), kind='stable')
+        pts_sorted = np.asarray(pts_ms, dtype=np.float64)[order]
+        keyframes = np.flatnonzero(np.asarray(is_key, dtype=bool)[order]).tolist()
+        if not raw_supported:
+            # Keyframe flags unavailable; seeks fall back to the backend's own positioning
+            keyframes = []
+        elif not keyframes or keyframes[0] != 0:
+            keyframes.insert(0, 0)
+        return cls(pts_sorted, keyframes, fps)
+
+    @classmethod
+    def load_or_build(cls, path, cache_dir=CACHE_DIR):
+        cache_path = os.path.join(cache_dir, 'video_index', _cache_key(path) + '.npz')
+        if os.path.exists(cache_path):
+            try:
+                return cls.load(cache_path)
+            except (OSError, ValueError, KeyError):
+                pass  # Corrupt cache entry; rebuild
+        index = cls.build(path)
+        index.save(cache_path)
+        return index
+
+
+class TimelineJob(threading.Thread):
+    """Background job: build/load the frame index, then render a thumbnail strip
+
+    Runs on its own VideoCapture so it never contends with the detection
+    loop's reader.
+    """
+    def __init__(self, path, thumbnail_count=60, thumbnail_width=160, cache_dir=CACHE_DIR):
+        super().__init__(daemon=True, name='timeline-job')
+        self.path = path
+        self.thumbnail_count = thumbnail_count
+        self.thumbnail_width = thumbnail_width
+        self.cache_dir = cache_dir
+        self.status = 'pending'  # pending, indexing, thumbnails, done, error
+        self.progress = 0.0
+        self.error = None
+        self.index = None
+        self.strip_jpeg = None
+        self.thumbnails = []  # [{'frame': idx, 'time': seconds}]
+        self.thumbnail_size = None
+        self.index_ready = threading.Event()
+
+    def run(self):
+        try:
+            self.status = 'indexing'
+            self.index = VideoIndex.load_or_build(self.path, self.cache_dir)
+            self.index_ready.set()
+            self.status = 'thumbnails'
+            self._build_thumbnails()
+            self.status = 'done'
+            self.progress = 1.0
+        except Exception as e:
+            print(f"Timeline job failed for {self.path}: {e}")
+            self.error = str(e)
+            self.status = 'error'
+        finally:
+            self.index_ready.set()
+
+    def _build_thumbnails(self):
+        index = self.index
+        if index.frame_count == 0:
+            return
+        key = _cache_key(self.path)
+        base = os.path.join(self.cache_dir, 'thumbnails', f'{key}-{self.thumbnail_count}-{self.thumbnail_width}')
+        strip_path, meta_path = base + '.jpg', base + '.json'
+        if os.path.exists(strip_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(strip_path, 'rb') as f:
+                self.strip_jpeg = f.read()
+            self.thumbnails = meta['thumbnails']
+            self.thumbnail_size = tuple(meta['thumbnail_size'])
+            return
+
+        # Sample evenly in time, snapped to keyframes so little forward decoding is needed
+        targets = np.linspace(0, index.frame_count - 1, min(self.thumbnail_count, index.frame_count)).astype(int)
+        frames = sorted({index.keyframe_at_or_before(t) if len(index.keyframes) else int(t) for t in targets})
+
+        cap = cv2.VideoCapture(self.path)
+        tiles, thumbnails = [], []
+        try:
+            for i, frame_idx in enumerate(frames):
+                self.progress = (i + 1) / len(frames)
+                if not index.seek(cap, frame_idx):
+                    continue
+                ret, frame = cap.read()
+                if not ret:
+                    continue
+                height = max(1, int(frame.shape[0] * self.thumbnail_width / frame.shape[1]))
+                tiles.append(cv2.resize(frame, (self.thumbnail_width, height), interpolation=cv2.INTER_AREA))
+                thumbnails.append({'frame': frame_idx, 'time': round(float(index.pts_ms[frame_idx]) / 1000.0, 3)})
+        finally:
+            cap.release()
+        if not tiles:
+            return
+
+        height = tiles[0].shape[0]
+        tiles = [t if t.shape[0] == height else cv2.resize(t, (self.thumbnail_width, height)) for t in tiles]
+        ok, buffer = cv2.imencode('.jpg', cv2.hconcat(tiles), [cv2.IMWRITE_JPEG_QUALITY, 70])
+        if not ok:
+            return
+        self.thumbnails = thumbnails
+        self.thumbnail_size = (self.thumbnail_width, height)
+        self.strip_jpeg = buffer.tobytes()
+
+        os.makedirs(os.path.dirname(strip_path), exist_ok=True)
+        for path, payload in ((strip_path, self.strip_jpeg),
+                              (meta_path, json.dumps({'thumbnails': thumbnails,
+                                                      'thumbnail_size': self.thumbnail_size}).encode('utf-8'))):
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
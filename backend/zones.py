@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+
+
+MAX_ZONES = 32  # Zone membership is packed into one uint32 per grid cell
+
+
+def point_line_distance(points, line_start, line_end):
+    """Perpendicular distance of each point (N, 2) to the infinite line through line_start/line_end"""
+    p1 = np.asarray(line_start, dtype=np.float64)
+    p2 = np.asarray(line_end, dtype=np.float64)
+    direction = p2 - p1
+    length = np.hypot(direction[0], direction[1])
+    if length == 0:
+        return np.hypot(points[:, 0] - p1[0], points[:, 1] - p1[1])
+    rel = points - p1
+    return np.abs(rel[:, 0] * direction[1] - rel[:, 1] * direction[0]) / length
+
+
+class ZoneSet:
+    """Polygon measurement zones (one per approach lane) rasterized to lookup masks
+
+    Polygons are drawn once into a downsampled grid, so per-frame cost is a
+    handful of array lookups and box fills regardless of polygon complexity.
+
+    zones: [{'id': str, 'polygon': [[x, y], ...], 'stop_line': [[x, y], [x, y]] (optional)}]
+    The stop line defaults to the polygon's first edge; queue length is measured from it.
+    """
+    def __init__(self, zones, grid_scale=4, queue_speed_kmh=5.0, min_track_samples=3):
+        if len(zones) > MAX_ZONES:
+            raise ValueError(f'At most {MAX_ZONES} zones are supported')
+        self.zones = []
+        for i, zone in enumerate(zones):
+            polygon = [tuple(map(int, p)) for p in zone['polygon']]
+            if len(polygon) < 3:
+                raise ValueError(f"Zone {zone.get('id', i)} needs at least 3 polygon points")
+            stop_line = zone.get('stop_line') or [polygon[0], polygon[1]]
+            self.zones.append({
+                'id': str(zone.get('id', f'zone-{i}')),
+                'polygon': polygon,
+                'stop_line': [tuple(map(int, p)) for p in stop_line]
+            })
+        self.grid_scale = grid_scale
+        self.queue_speed_kmh = queue_speed_kmh  # Tracks slower than this count as queued
+        self.min_track_samples = min_track_samples  # Ignore tracks too new to have a speed
+        self._frame_shape = None
+        self._masks = None       # (Z, gh, gw) bool
+        self._membership = None  # (gh, gw) uint32 bitmask of zones covering each cell
+        self._areas = None       # (Z,) cells per zone
+
+    def to_config(self):
+        return [{'id': z['id'], 'polygon': [list(p) for p in z['polygon']],
+                 'stop_line': [list(p) for p in z['stop_line']]} for z in self.zones]
+
+    def _ensure_masks(self, frame_shape):
+        height, width = frame_shape[:2]
+        if self._frame_shape == (height, width):
+            return
+        s = self.grid_scale
+        grid_h, grid_w = -(-height // s), -(-width // s)
+        masks = np.zeros((len(self.zones), grid_h, grid_w), dtype=np.uint8)
+        for i, zone in enumerate(self.zones):
+            polygon = np.round(np.asarray(zone['polygon'], dtype=np.float64) / s).astype(np.int32)
+            cv2.fillPoly(masks[i], [polygon], 1)
+        self._masks = masks.astype(bool)
+        bits = (np.uint32(1) << np.arange(len(self.zones), dtype=np.uint32))[:, None, None]
+        self._membership = (self._masks * bits).sum(axis=0, dtype=np.uint32)
+        self._areas = np.maximum(self._masks.sum(axis=(1, 2)), 1)
+        self._frame_shape = (height, width)
+
+    def zones_at(self, points):
+        """(N, Z) bool membership for pixel points (N, 2)"""
+        if not len(points):
+            return np.zeros((0, len(self.zones)), dtype=bool)
+        s = self.grid_scale
+        grid_h, grid_w = self._membership.shape
+        cols = np.clip(np.asarray(points[:, 0], dtype=np.int64) // s, 0, grid_w - 1)
+        rows = np.clip(np.asarray(points[:, 1], dtype=np.int64) // s, 0, grid_h - 1)
+        bits = self._membership[rows, cols]
+        return ((bits[:, None] >> np.arange(len(self.zones), dtype=np.uint32)) & 1).astype(bool)
+
+    def measure(self, frame_shape, boxes, tracks, pixel_to_meter_ratio):
+        """Per-zone occupancy %, queued vehicles and queue length in meters
+
+        boxes: (N, 4) x1, y1, x2, y2 of this frame's detections
+        tracks: VehicleTracker.tracks
+        """
+        if not self.zones:
+            return []
+        self._ensure_masks(frame_shape)
+        s = self.grid_scale
+        grid_h, grid_w = self._membership.shape
+
+        # Occupancy: fraction of each zone's cells covered by any detection box
+        covered = np.zeros((grid_h, grid_w), dtype=bool)
+        for x1, y1, x2, y2 in np.asarray(boxes, dtype=np.int64).reshape(-1, 4) // s:
+            covered[max(0, y1):max(0, y2 + 1), max(0, x1):max(0, x2 + 1)] = True
+        occupancy = (self._masks & covered).sum(axis=(1, 2)) / self._areas * 100.0
+
+        # Queue: stationary, currently visible tracks whose centroid is inside a zone
+        queued_boxes = [
+            t['bbox'] for t in tracks.values()
+            if t.get('disappeared', 0) == 0 and 'bbox' in t
+            and len(t.get('position_history', ())) >= self.min_track_samples
+            and t.get('speed', 0.0) < self.queue_speed_kmh
+        ]
+        queued_boxes = np.asarray(queued_boxes, dtype=np.float64).reshape(-1, 4)
+        centroids = np.column_stack(((queued_boxes[:, 0] + queued_boxes[:, 2]) / 2,
+                                     (queued_boxes[:, 1] + queued_boxes[:, 3]) / 2))
+        inside = self.zones_at(centroids)
+
+        metrics = []
+        for i, zone in enumerate(self.zones):
+            zone_boxes = queued_boxes[inside[:, i]]
+            queue_px = 0.0
+            if len(zone_boxes):
+                # Farthest box corner from the stop line = tail of the queue
+                corners = zone_boxes[:, [0, 1, 2, 1, 0, 3, 2, 3]].reshape(-1, 2)
+                queue_px = float(point_line_distance(corners, *zone['stop_line']).max())
+            metrics.append({
+                'id': zone['id'],
+                'occupancy': round(float(occupancy[i]), 1),
+                'queued_vehicles': int(len(zone_boxes)),
+                'queue_length_m': round(queue_px * pixel_to_meter_ratio, 1)
+            })
+        return metrics
@@ -290,6 +290,7 @@ class DetectionAPI {
       average_speed: number;
       traffic_density: string;
       queue_length: number;
+      queue_length_m?: number | null;
       congestion_level: string;
       last_updated: string;
     };